@@ -0,0 +1,105 @@
+import os
+import math
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+# Configuration
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "1000"))  # Max cached answers
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))  # Seconds
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))  # Min cosine similarity
+
+
+def context_key(ids: list, documents: list) -> str:
+    """Fingerprint of a retrieved chunk set, covering both ids and contents"""
+    digest = hashlib.sha256()
+    for chunk_id, document in sorted(zip(ids, documents)):
+        digest.update(chunk_id.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(document.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _normalize(vector: list) -> list:
+    norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+    return [x / norm for x in vector]
+
+
+class AnswerCache:
+    """In-memory semantic cache of /ask answers.
+
+    Answers are bucketed by (session, retrieved chunk set). A new question
+    hits when it retrieved exactly the same chunks and its embedding is
+    within ``threshold`` cosine similarity of a cached question. Entries
+    expire after ``ttl`` seconds and the least recently used are evicted
+    beyond ``max_entries``.
+    """
+
+    def __init__(self, max_entries: int = ANSWER_CACHE_SIZE, ttl: float = ANSWER_CACHE_TTL,
+                 threshold: float = ANSWER_CACHE_THRESHOLD):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self.entries = OrderedDict()  # (session_id, context_key, n) -> (unit vector, answer, created_at)
+        self.buckets = {}  # (session_id, context_key) -> set of entry keys
+        self.counter = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, session_id: str, embedding: list, ctx_key: str):
+        """Cached answer for a similar question over the same chunks, or None"""
+        query = _normalize(embedding)
+        now = time.time()
+        with self.lock:
+            best, best_score = None, self.threshold
+            for key in list(self.buckets.get((session_id, ctx_key), ())):
+                vector, answer, created_at = self.entries[key]
+                if now - created_at > self.ttl:
+                    self._remove(key)
+                    continue
+                score = sum(a * b for a, b in zip(query, vector))
+                if score >= best_score:
+                    best, best_score = key, score
+
+            if best is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(best)
+            self.hits += 1
+            return self.entries[best][1]
+
+    def put(self, session_id: str, embedding: list, ctx_key: str, answer: str):
+        with self.lock:
+            self.counter += 1
+            key = (session_id, ctx_key, self.counter)
+            self.entries[key] = (_normalize(embedding), answer, time.time())
+            self.buckets.setdefault((session_id, ctx_key), set()).add(key)
+            while len(self.entries) > self.max_entries:
+                self._remove(next(iter(self.entries)))
+
+    def invalidate(self, session_id: str):
+        """Forget every answer for a session (e.g. after re-indexing)"""
+        with self.lock:
+            for key in [key for key in self.entries if key[0] == session_id]:
+                self._remove(key)
+
+    def _remove(self, key):
+        del self.entries[key]
+        bucket = self.buckets.get(key[:2])
+        if bucket is not None:
+            bucket.discard(key)
+            if not bucket:
+                del self.buckets[key[:2]]
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                "entries": len(self.entries),
+            }
@@ -2,28 +2,41 @@ from dotenv import load_dotenv
 load_dotenv()  # Load before other imports
 import os
 import uuid
+import atexit
 import zipfile
 import logging
 import json
-import time
-from pathlib import Path
-from datetime import datetime, timedelta
 from functools import wraps
 
-from flask import Flask, request, jsonify
+from flask import Blueprint, Flask, Response, current_app, request, jsonify, stream_with_context
 from flask_cors import CORS
 import chromadb
 from chromadb.config import Settings
-import requests
+from embeddings import get_embedding, embedding_cache, query_cache, backend as embedding_backend
+from ingest import process_repo, ZipSource
+from jobs import JobManager, JobQueueFull
+from openrouter import chat_completion, stream_chat_completion
+from sessions import SessionStore, is_valid_session_id
+from answer_cache import AnswerCache, context_key
+from summaries import SummaryStore, generate_summary
+from checkpoints import CheckpointStore
+from context import pack_context
+from lexical import LexicalIndex, code_identifiers, reciprocal_rank_fusion
+from ratelimit import make_rate_limit_store, retry_after_header
 
 # Load environment variables
 # load_dotenv()
 
 # Configuration
-UPLOAD_DIR = "uploads"
 MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB
-ALLOWED_EXTENSIONS = {".js", ".jsx", ".ts", ".tsx", ".py", ".html", ".css", ".json"}
-os.makedirs(UPLOAD_DIR, exist_ok=True)
+CHROMA_PATH = os.getenv("CHROMA_PATH", "chroma_db")
+CHROMA_HOST = os.getenv("CHROMA_HOST")  # Chroma server shared by all workers; unset uses CHROMA_PATH
+CHROMA_PORT = int(os.getenv("CHROMA_PORT", "8000"))
+ASK_CANDIDATES = 12  # Ranked chunks offered to the context packer per question
+FUSION_CANDIDATES = 20  # Chunks taken from each of vector and lexical search before fusing
+ASK_RATE_LIMIT = 20  # Questions per minute per client
+CORS_ORIGINS = ["http://localhost:3000", "http://127.0.0.1:3000"]
+INCOMPATIBLE_SESSION = "Session was indexed with a different embedding model, upload it again"
 
 # Logging
 logging.basicConfig(
@@ -32,147 +45,141 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Flask App with CORS
-app = Flask(__name__)
-# CORS(app, resources={
-#     r"/*": {"origins": ["http://localhost:3000"]}
-# })
-CORS(app, resources={
-    r"/*": {
-        "origins": ["http://localhost:3000", "http://127.0.0.1:3000"],
-        "methods": ["GET", "POST", "OPTIONS"],
-        "allow_headers": ["Content-Type"]
-    }
-})
-# ChromaDB Setup
-chroma_client = chromadb.PersistentClient(path="chroma_db")
-collection = chroma_client.get_or_create_collection(
-    name="code_chunks",
-    metadata={"hnsw:space": "cosine"}
-)
+# Routes; the app itself is built by create_app()
+api = Blueprint("api", __name__)
+
+
+def make_chroma_client():
+    """Chroma server when CHROMA_HOST is set (needed for several workers), else the local directory"""
+    if CHROMA_HOST:
+        return chromadb.HttpClient(host=CHROMA_HOST, port=CHROMA_PORT)
+    return chromadb.PersistentClient(path=CHROMA_PATH)
+
+
+class Services:
+    """Stores, caches and the job runner behind the API, one set per worker process.
+
+    Everything here holds connections or threads that must not cross a
+    fork, so create_app() builds it inside each worker. State shared
+    between workers lives in the SQLite stores and Chroma, not in memory.
+    """
+
+    def __init__(self):
+        # One collection per session
+        self.sessions = SessionStore(make_chroma_client(), embedding_model=embedding_backend.model_id)
+        # Semantic cache of /ask answers
+        self.answer_cache = AnswerCache()
+        # BM25 index for exact identifier lookups
+        self.lexical_index = LexicalIndex()
+        # Precomputed repository summaries
+        self.summary_store = SummaryStore()
+        # Background ingestion jobs, checkpointed so they survive restarts
+        self.checkpoints = CheckpointStore()
+        self.job_manager = JobManager(status_store=self.checkpoints)
+        # Per-client request limits (RATE_LIMIT_BACKEND=sqlite shares them across workers)
+        self.rate_limit_store = make_rate_limit_store()
+
+    def index_session(self, archive_path: str, session_id: str, progress=None,
+                      incremental: bool = False, resume: bool = False):
+        """Ingestion job: index the uploaded archive, then precompute the session summary"""
+        source = ZipSource(archive_path)
+        try:
+            # Old data is only cleared once the upload is accepted (or on resume, if a crash came first)
+            collection = self.sessions.get(session_id)
+            if collection is None and self.sessions.is_legacy(session_id):
+                # Legacy sessions move to their own collection with a full re-index
+                self.sessions.drop_legacy(session_id)
+            elif collection is not None and not self.sessions.is_compatible(collection):
+                # Vectors from another embedding model can't be mixed; start over
+                self.sessions.drop(session_id)
+                self.lexical_index.delete_session(session_id)
+            collection = self.sessions.create(session_id)
+            chunks = process_repo(source, session_id, collection, progress=progress, incremental=incremental,
+                                  lexical=self.lexical_index, checkpoints=self.checkpoints, resume=resume)
+
+            try:
+                self.summary_store.refresh(session_id, collection)
+            except Exception as e:
+                # /summary will retry lazily
+                logger.error(f"Summary precompute failed for {session_id}: {str(e)}")
+            return chunks
+        finally:
+            source.close()
+            # Only runs cut short by the process dying are resumed. The run stays active and
+            # claimed until the summary is stored, so /summary and new uploads wait for it
+            self.checkpoints.finish(session_id)
+
+    def resume_ingestion(self):
+        """Requeue ingestion runs that were interrupted by a crash or restart.
+
+        Runs still claimed by a live worker are left to it.
+        """
+        for session_id, archive_path, incremental in self.checkpoints.unfinished():
+            if not self.checkpoints.claim(session_id):
+                continue
+            if not os.path.exists(archive_path):
+                self.checkpoints.finish(session_id)
+                continue
+            try:
+                self.job_manager.submit(session_id, self.index_session, archive_path, session_id,
+                                        incremental=incremental, resume=True)
+                logger.info(f"Resuming ingestion of {session_id}")
+            except JobQueueFull:
+                self.checkpoints.release(session_id)
+                logger.warning("Job queue full, remaining interrupted ingestions resume on next start")
+                return
+
+    def close(self):
+        """Stop taking jobs; queued ones stay checkpointed for the next start"""
+        self.job_manager.shutdown(wait=False, cancel_futures=True)
+
+
+def services() -> Services:
+    return current_app.extensions["services"]
+
+
+def create_app(resume_jobs: bool = True) -> Flask:
+    """Application factory, called once per worker process.
+
+    Production: ``gunicorn "app:create_app()"`` (settings in gunicorn.conf.py).
+    """
+    app = Flask(__name__)
+    # CORS(app, resources={
+    #     r"/*": {"origins": ["http://localhost:3000"]}
+    # })
+    CORS(app, resources={
+        r"/*": {
+            "origins": CORS_ORIGINS,
+            "methods": ["GET", "POST", "OPTIONS"],
+            "allow_headers": ["Content-Type"]
+        }
+    })
+    app.register_blueprint(api)
+
+    app.extensions["services"] = Services()
+    atexit.register(app.extensions["services"].close)
+    if resume_jobs:
+        app.extensions["services"].resume_ingestion()
+    return app
 
-# Rate limiting storage
-request_times = {}
 
 def rate_limit(max_per_minute):
     def decorator(f):
         @wraps(f)
         def wrapped(*args, **kwargs):
-            ip = request.remote_addr
-            now = datetime.now()
-            
-            # Initialize if first request
-            if ip not in request_times:
-                request_times[ip] = []
-            
-            # Remove old requests
-            request_times[ip] = [
-                t for t in request_times[ip] 
-                if now - t < timedelta(minutes=1)
-            ]
-            
-            # Check limit
-            if len(request_times[ip]) >= max_per_minute:
-                return jsonify({"error": "Rate limit exceeded"}), 429
-                
-            request_times[ip].append(now)
+            # Each endpoint has its own budget per client
+            allowed, retry_after = services().rate_limit_store.hit(
+                f"{f.__name__}:{request.remote_addr}", max_per_minute
+            )
+            if not allowed:
+                response = jsonify({"error": "Rate limit exceeded"})
+                response.headers["Retry-After"] = retry_after_header(retry_after)
+                return response, 429
             return f(*args, **kwargs)
         return wrapped
     return decorator
 
-def get_embedding(text: str) -> list:
-    """Get text embedding with error handling"""
-    if not text.strip():
-        return [0.0] * 768
-        
-    try:
-        response = requests.post(
-            "https://openrouter.ai/api/v1/embeddings",
-            headers={
-                "Authorization": f"Bearer {os.getenv('OPENROUTER_API_KEY')}",
-                "Content-Type": "application/json",
-                "HTTP-Referer": "http://localhost:5000",
-                "X-Title": "Code Analyzer"
-            },
-            json={
-                "model": "mistralai/mistral-embed",
-                "input": text
-            },
-            timeout=30
-        )
-        response.raise_for_status()
-        return response.json()["data"][0]["embedding"]
-    except Exception as e:
-        logger.error(f"Embedding error: {str(e)}")
-        raise
-def chunk_code(content: str, chunk_size: int = 800) -> list[str]:
-    """Split code into chunks with line awareness"""
-    lines = content.split('\n')
-    chunks = []
-    current_chunk = []
-    current_length = 0
-
-    for line in lines:
-        line_length = len(line) + 1  # +1 for newline
-        if current_length + line_length > chunk_size and current_chunk:
-            chunks.append('\n'.join(current_chunk))
-            current_chunk = []
-            current_length = 0
-        current_chunk.append(line)
-        current_length += line_length
-
-    if current_chunk:
-        chunks.append('\n'.join(current_chunk))
-    return chunks
-
-
-def process_repo(repo_path: str, session_id: str):
-    """Process files with better error handling"""
-    chunks_processed = 0
-    for root, dirs, files in os.walk(repo_path):
-        # Skip unwanted directories
-        if 'node_modules' in dirs:
-            dirs.remove('node_modules')
-        
-        for filename in files:
-            filepath = Path(root) / filename
-            if filepath.suffix.lower() not in ALLOWED_EXTENSIONS:
-                continue
-
-            try:
-                # Skip large files
-                if os.path.getsize(filepath) > 1 * 1024 * 1024:
-                    continue
-
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                    chunks = chunk_code(content)
-                    
-                    for idx, chunk in enumerate(chunks):
-                        try:
-                            embed = get_embedding(chunk)
-                            collection.add(
-                                documents=[chunk],
-                                embeddings=[embed],
-                                metadatas=[{
-                                    "file": filename,
-                                    "path": str(filepath.relative_to(repo_path)),
-                                    "chunk_index": idx,
-                                    "session_id": session_id
-                                }],
-                                ids=[f"{session_id}_{idx}"]
-                            )
-                            chunks_processed += 1
-                            time.sleep(0.2)  # Rate limit
-                        except Exception as e:
-                            logger.error(f"Chunk error: {str(e)}")
-                            continue
-            except Exception as e:
-                logger.error(f"File error: {str(e)}")
-                continue
-    return chunks_processed
-
-@app.route('/upload', methods=['POST'])
+@api.route('/upload', methods=['POST'])
 @rate_limit(max_per_minute=10)
 def upload_repo():
     if 'file' not in request.files:
@@ -185,6 +192,8 @@ def upload_repo():
     if not file.filename.endswith('.zip'):
         return jsonify({"error": "Only ZIP files allowed"}), 400
 
+    svc = services()
+    claimed = submitted = False
     try:
         file.seek(0, os.SEEK_END)
         file_size = file.tell()
@@ -192,104 +201,288 @@ def upload_repo():
         if file_size > MAX_FILE_SIZE:
             return jsonify({"error": "File too large"}), 413
 
-        session_id = str(uuid.uuid4())
-        repo_path = os.path.join(UPLOAD_DIR, session_id)
-        os.makedirs(repo_path, exist_ok=True)
-        
-        with zipfile.ZipFile(file, 'r') as zip_ref:
-            zip_ref.extractall(repo_path)
+        # Re-index an existing session in place, or start a new one
+        session_id = request.args.get('session_id')
+        incremental = bool(session_id)
+        if incremental and not is_valid_session_id(session_id):
+            return jsonify({"error": "Invalid session_id"}), 400
+        if not incremental:
+            session_id = str(uuid.uuid4())
+        # Held until the job finishes, so no other worker indexes the session meanwhile
+        if not svc.checkpoints.claim(session_id):
+            return jsonify({"error": "Session is already being indexed"}), 409
+        claimed = True
+
+        if incremental:
+            collection = svc.sessions.get(session_id)
+            if collection is None:
+                if not svc.sessions.is_legacy(session_id):
+                    return jsonify({"error": "Unknown session"}), 404
+                # Legacy sessions are re-indexed in full; the job drops their old chunks
+                incremental = False
+            elif not svc.sessions.is_compatible(collection):
+                # Embedded with another model: re-indexed in full, the job drops the old vectors
+                incremental = False
+
+        # Kept on disk until indexed so an interrupted run can resume; members
+        # are read straight from the archive, nothing is extracted
+        archive_path = svc.checkpoints.archive_path(session_id)
+        file.save(archive_path)
+        try:
+            ZipSource(archive_path).close()
+        except zipfile.BadZipFile:
+            os.remove(archive_path)
+            return jsonify({"error": "Invalid ZIP file"}), 400
         
-        chunks = process_repo(repo_path, session_id)
+        svc.summary_store.delete(session_id)
+        svc.answer_cache.invalidate(session_id)
+        svc.checkpoints.start(session_id, incremental)
+        try:
+            svc.job_manager.submit(session_id, svc.index_session, archive_path, session_id, incremental=incremental)
+            submitted = True
+        except JobQueueFull:
+            svc.checkpoints.finish(session_id)
+            raise
         return jsonify({
-            "message": "Upload processed",
+            "message": "Upload accepted",
             "session_id": session_id,
-            "chunks_processed": chunks
-        })
+            "status_url": f"/status/{session_id}"
+        }), 202
+    except JobQueueFull:
+        return jsonify({"error": "Too many uploads in progress, try again later"}), 503
     except Exception as e:
         logger.error(f"Upload failed: {str(e)}")
         return jsonify({"error": "Upload failed"}), 500
-
-@app.route('/ask', methods=['POST'])
-@rate_limit(max_per_minute=20)
+    finally:
+        if claimed and not submitted:
+            svc.checkpoints.release(session_id)
+
+@api.route('/status/<session_id>', methods=['GET'])
+def upload_status(session_id):
+    """Progress of a background ingestion job, which may be running in another worker"""
+    svc = services()
+    job = svc.job_manager.get(session_id)
+    if job:
+        return jsonify(job.to_dict())
+    status = svc.checkpoints.get_status(session_id)
+    if not status:
+        return jsonify({"error": "Unknown session"}), 404
+    return jsonify(status)
+
+@api.route('/stats', methods=['GET'])
+def cache_stats():
+    """Cache hit/miss counters"""
+    return jsonify({
+        "embedding_cache": embedding_cache.stats() if embedding_cache else None,
+        "query_embedding_cache": query_cache.stats() if query_cache else None,
+        "answer_cache": services().answer_cache.stats()
+    })
+
+def sse_event(payload: dict, event: str = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(payload)}\n\n"
+
+def stream_answer(messages: list, on_complete=None) -> Response:
+    """Relay the provider's token stream to the client as Server-Sent Events"""
+    def generate():
+        try:
+            parts = []
+            for delta in stream_chat_completion(messages, temperature=0.3):
+                parts.append(delta)
+                yield sse_event({"delta": delta})
+            if on_complete:
+                on_complete("".join(parts))
+            yield sse_event({}, event="done")
+        except Exception as e:
+            logger.error(f"Streaming answer failed: {str(e)}")
+            yield sse_event({"error": "Question processing failed"}, event="error")
+
+    return sse_response(generate())
+
+def sse_response(events) -> Response:
+    return Response(
+        stream_with_context(events),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def fetch_chunks(collection, ids: list):
+    """(ids, documents, metadatas) for chunk ids, in the given order"""
+    found = collection.get(ids=ids, include=["documents", "metadatas"])
+    by_id = {chunk_id: (doc, meta) for chunk_id, doc, meta in
+             zip(found['ids'], found['documents'], found['metadatas'])}
+    ids = [chunk_id for chunk_id in ids if chunk_id in by_id]
+    return ids, [by_id[i][0] for i in ids], [by_id[i][1] for i in ids]
+
+
+def names_symbol(identifiers: set, meta: dict) -> bool:
+    for symbol in filter(None, meta.get('symbols', '').split(',')):
+        if symbol.lower() in identifiers or symbol.rsplit('.', 1)[-1].lower() in identifiers:
+            return True
+    return False
+
+
+def lexical_candidates(lexical_index, session_id: str, collection, question: str):
+    """BM25 candidate ids, plus (ids, documents, metadatas) when they already answer the question.
+
+    That is when the question names a symbol defined in the top hits; no
+    embedding is needed then.
+    """
+    lexical_ids = [chunk_id for chunk_id, _ in lexical_index.search(session_id, question, FUSION_CANDIDATES)]
+    identifiers = code_identifiers(question)
+    if lexical_ids and identifiers:
+        ids, docs, metas = fetch_chunks(collection, lexical_ids[:ASK_CANDIDATES])
+        if any(names_symbol(identifiers, meta) for meta in metas):
+            return lexical_ids, (ids, docs, metas)
+    return lexical_ids, None
+
+
+def vector_results(collection, where, question_embed: list, lexical_ids: list):
+    """Vector search merged with the BM25 candidates by reciprocal rank fusion: (ids, documents, metadatas)"""
+    results = collection.query(
+        query_embeddings=[question_embed],
+        n_results=FUSION_CANDIDATES if lexical_ids else ASK_CANDIDATES,
+        where=where,
+        include=["documents", "metadatas"]
+    )
+    if not results['ids'] or not results['ids'][0]:
+        return [], [], []
+    if not lexical_ids:
+        return results['ids'][0], results['documents'][0], results['metadatas'][0]
+
+    fetched = {chunk_id: (doc, meta) for chunk_id, doc, meta in
+               zip(results['ids'][0], results['documents'][0], results['metadatas'][0])}
+    fused = reciprocal_rank_fusion([results['ids'][0], lexical_ids])[:ASK_CANDIDATES]
+    missing = [chunk_id for chunk_id in fused if chunk_id not in fetched]
+    if missing:
+        for chunk_id, doc, meta in zip(*fetch_chunks(collection, missing)):
+            fetched[chunk_id] = (doc, meta)
+    ids = [chunk_id for chunk_id in fused if chunk_id in fetched]
+    return ids, [fetched[i][0] for i in ids], [fetched[i][1] for i in ids]
+
+
+def retrieve_chunks(lexical_index, session_id: str, collection, where, question: str):
+    """Hybrid search: (ids, documents, metadatas, question embedding or None)"""
+    lexical_ids, answered = lexical_candidates(lexical_index, session_id, collection, question)
+    if answered:
+        return (*answered, None)
+    question_embed = get_embedding(question)
+    return (*vector_results(collection, where, question_embed, lexical_ids), question_embed)
+
+
+def check_ask_request(data):
+    """(error, status) for an invalid /ask body, or None"""
+    if data is not None and not isinstance(data, dict):
+        return "Request body must be a JSON object", 400
+    if not data or not isinstance(data.get('question'), str):
+        return "No question provided", 400
+    session_id = data.get('session_id')
+    if not session_id:
+        return "No session_id provided", 400
+    if not is_valid_session_id(session_id):
+        return "Invalid session_id", 400
+    if not data['question'].strip():
+        return "Empty question", 400
+    return None
+
+
+def build_context(ids: list, documents: list, metadatas: list):
+    """(prompt context packed within the token budget, answer cache key for it)"""
+    context, used = pack_context(documents, metadatas)
+    return context, context_key([ids[i] for i in used], [documents[i] for i in used])
+
+
+def build_messages(question: str, context: str) -> list:
+    return [{
+        "role": "user",
+        "content": f"Answer this about the codebase:\n{question}\n\nCode Context:\n{context}"
+    }]
+
+
+@api.route('/ask', methods=['POST'])
+@rate_limit(max_per_minute=ASK_RATE_LIMIT)
 def ask_question():
-    data = request.get_json()
-    if not data or 'question' not in data:
-        return jsonify({"error": "No question provided"}), 400
+    data = request.get_json(silent=True)
+    invalid = check_ask_request(data)
+    if invalid:
+        error, status = invalid
+        return jsonify({"error": error}), status
         
     try:
+        session_id = data['session_id']
         question = data['question'].strip()
-        if not question:
-            return jsonify({"error": "Empty question"}), 400
+
+        # Only the session's own chunks are searched
+        svc = services()
+        collection, where = svc.sessions.resolve(session_id)
+        if collection is None:
+            return jsonify({"error": "Unknown session"}), 404
+        if not svc.sessions.is_compatible(collection):
+            return jsonify({"error": INCOMPATIBLE_SESSION}), 409
             
-        question_embed = get_embedding(question)
-        results = collection.query(
-            query_embeddings=[question_embed],
-            n_results=5,
-            include=["documents", "metadatas"]
-        )
-        
-        if not results['documents']:
+        ids, documents, metadatas, question_embed = retrieve_chunks(svc.lexical_index, session_id, collection,
+                                                                    where, question)
+        if not documents:
             return jsonify({"error": "No relevant code found"}), 404
+
+        # Similar question over the same chunks: reuse the earlier answer
+        # (lexical-only lookups have no embedding to compare, so they skip the cache)
+        context, ctx_key = build_context(ids, documents, metadatas)
+        cached = svc.answer_cache.get(session_id, question_embed, ctx_key) if question_embed else None
+        if cached is not None:
+            if data.get('stream'):
+                return sse_response(iter([sse_event({"delta": cached}), sse_event({"cached": True}, event="done")]))
+            return jsonify({"answer": cached, "cached": True})
             
-        context = "\n\n".join([
-            f"From {meta['path']}:\n{text}"
-            for text, meta in zip(results['documents'][0], results['metadatas'][0])
-        ])
-        
-        response = requests.post(
-            "https://openrouter.ai/api/v1/chat/completions",
-            headers={
-                "Authorization": f"Bearer {os.getenv('OPENROUTER_API_KEY')}",
-                "Content-Type": "application/json"
-            },
-            json={
-                "model": "openai/gpt-3.5-turbo",
-                "messages": [{
-                    "role": "user",
-                    "content": f"Answer this about the codebase:\n{question}\n\nCode Context:\n{context}"
-                }],
-                "temperature": 0.3
-            }
-        )
-        response.raise_for_status()
-        answer = response.json()["choices"][0]["message"]["content"]
+        messages = build_messages(question, context)
+        def remember(answer):
+            if question_embed:
+                svc.answer_cache.put(session_id, question_embed, ctx_key, answer)
+
+        if data.get('stream'):
+            return stream_answer(messages, on_complete=remember)
+
+        answer = chat_completion(messages, temperature=0.3)
+        remember(answer)
         return jsonify({"answer": answer})
     except Exception as e:
         logger.error(f"Question failed: {str(e)}")
         return jsonify({"error": "Question processing failed"}), 500
 
-@app.route('/summary', methods=['GET'])
+@api.route('/summary', methods=['GET'])
 @rate_limit(max_per_minute=15)
 def get_summary():
+    session_id = request.args.get('session_id')
+    if session_id and not is_valid_session_id(session_id):
+        return jsonify({"error": "Invalid session_id"}), 400
+
     try:
-        results = collection.get(limit=20)
-        if not results['documents']:
-            return jsonify({"error": "No code available"}), 404
-            
-        context = "\n".join(results['documents'][:5])  # Use first 5 chunks
-        
-        response = requests.post(
-            "https://openrouter.ai/api/v1/chat/completions",
-            headers={
-                "Authorization": f"Bearer {os.getenv('OPENROUTER_API_KEY')}",
-                "Content-Type": "application/json"
-            },
-            json={
-                "model": "openai/gpt-3.5-turbo",
-                "messages": [{
-                    "role": "user",
-                    "content": f"Summarize this code:\n{context}\nRespond in JSON with: projectName, technologies, codeQuality, architecture"
-                }],
-                "response_format": {"type": "json_object"}
-            }
-        )
-        response.raise_for_status()
-        return jsonify(response.json()["choices"][0]["message"]["content"])
+        svc = services()
+        if not session_id:
+            summary = generate_summary(svc.sessions.legacy)
+            if summary is None:
+                return jsonify({"error": "No code available"}), 404
+            return jsonify(summary)
+
+        # Served from the store; computed at ingestion, or here on first request
+        summary = svc.summary_store.get(session_id)
+        if summary is None:
+            if svc.checkpoints.active(session_id):
+                return jsonify({"error": "Session is still being indexed"}), 409
+            collection, where = svc.sessions.resolve(session_id)
+            if collection is None:
+                return jsonify({"error": "Unknown session"}), 404
+            summary = svc.summary_store.refresh(session_id, collection, where)
+            if summary is None:
+                return jsonify({"error": "No code available"}), 404
+        return jsonify(summary)
     except Exception as e:
         logger.error(f"Summary failed: {str(e)}")
         return jsonify({"error": "Summary failed"}), 500
 
 if __name__ == '__main__':
+    # Development server. The reloader runs this file twice; only the serving child resumes jobs
+    app = create_app(resume_jobs=os.environ.get("WERKZEUG_RUN_MAIN") == "true")
     app.run(host='0.0.0.0', port=5000, debug=True)
     
     # import os
@@ -0,0 +1,200 @@
+# ASGI entry point: POST /ask runs on the event loop, every other route on the Flask app.
+#
+#     uvicorn --factory asgi:create_asgi_app --workers 4
+#
+# A question awaits its embedding and chat completion instead of holding a
+# thread for them, so one worker can have hundreds in flight; the limit is
+# the provider connection pool (ASYNC_HTTP_POOL_SIZE) and the embedding
+# rate limiter. Local work (Chroma, BM25, caches) runs on worker threads.
+import json
+import asyncio
+import logging
+
+from app import (create_app, check_ask_request, lexical_candidates, vector_results, build_context, build_messages,
+                 sse_event, ASK_RATE_LIMIT, CORS_ORIGINS, INCOMPATIBLE_SESSION)
+from embeddings import get_embedding_async
+from openrouter import async_chat_completion, async_stream_chat_completion, close_async_client
+from ratelimit import retry_after_header
+
+try:
+    from a2wsgi import WSGIMiddleware
+except ImportError:  # Older bridge bundled with uvicorn
+    from uvicorn.middleware.wsgi import WSGIMiddleware
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+WSGI_THREADS = 16  # Threads serving the Flask routes
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, error: str, headers: list = ()):
+        super().__init__(error)
+        self.status = status
+        self.error = error
+        self.headers = list(headers)
+
+
+async def read_body(receive) -> bytes:
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            return body
+
+
+class AsyncAskApp:
+    """Serves /ask asynchronously and hands everything else to the Flask app"""
+
+    def __init__(self, flask_app):
+        self.services = flask_app.extensions["services"]
+        self.wsgi = WSGIMiddleware(flask_app, workers=WSGI_THREADS)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self.lifespan(receive, send)
+        elif scope["type"] == "http" and scope["path"] == "/ask" and scope["method"] == "POST":
+            await self.ask(scope, receive, send)
+        else:
+            # Including the CORS preflight for /ask, which flask-cors answers
+            await self.wsgi(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.services.close()
+                await close_async_client()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def ask(self, scope, receive, send):
+        headers = {name.decode("latin-1").lower(): value.decode("latin-1") for name, value in scope["headers"]}
+        origin = headers.get("origin")
+        cors = [(b"vary", b"Origin")]
+        if origin in CORS_ORIGINS:
+            cors.append((b"access-control-allow-origin", origin.encode("latin-1")))
+
+        try:
+            data = json.loads(await read_body(receive) or b"null")
+        except ValueError:
+            data = None
+        try:
+            answer = await self.answer(scope, data)
+        except HTTPError as e:
+            await self.send_json(send, e.status, {"error": e.error}, cors + e.headers)
+            return
+        except Exception as e:
+            logger.error(f"Question failed: {str(e)}")
+            await self.send_json(send, 500, {"error": "Question processing failed"}, cors)
+            return
+
+        if isinstance(answer, dict):
+            await self.send_json(send, 200, answer, cors)
+        else:
+            await self.send_events(send, answer, cors)
+
+    async def answer(self, scope, data):
+        """The JSON answer, or an async iterator of SSE events when streaming"""
+        svc = self.services
+        client = scope.get("client")
+        # Same key as the Flask route, so both share a client's budget
+        allowed, retry_after = await asyncio.to_thread(
+            svc.rate_limit_store.hit, f"ask_question:{client[0] if client else None}", ASK_RATE_LIMIT
+        )
+        if not allowed:
+            raise HTTPError(429, "Rate limit exceeded", [(b"retry-after", retry_after_header(retry_after).encode())])
+
+        invalid = check_ask_request(data)
+        if invalid:
+            raise HTTPError(invalid[1], invalid[0])
+        session_id = data['session_id']
+        question = data['question'].strip()
+
+        # Only the session's own chunks are searched
+        collection, where = await asyncio.to_thread(svc.sessions.resolve, session_id)
+        if collection is None:
+            raise HTTPError(404, "Unknown session")
+        if not svc.sessions.is_compatible(collection):
+            raise HTTPError(409, INCOMPATIBLE_SESSION)
+
+        lexical_ids, answered = await asyncio.to_thread(lexical_candidates, svc.lexical_index, session_id,
+                                                        collection, question)
+        if answered:
+            ids, documents, metadatas = answered
+            question_embed = None
+        else:
+            question_embed = await get_embedding_async(question)
+            ids, documents, metadatas = await asyncio.to_thread(vector_results, collection, where,
+                                                                question_embed, lexical_ids)
+        if not documents:
+            raise HTTPError(404, "No relevant code found")
+
+        # Similar question over the same chunks: reuse the earlier answer
+        context, ctx_key = build_context(ids, documents, metadatas)
+        cached = svc.answer_cache.get(session_id, question_embed, ctx_key) if question_embed else None
+        if cached is not None:
+            if data.get('stream'):
+                return iter_events([sse_event({"delta": cached}), sse_event({"cached": True}, event="done")])
+            return {"answer": cached, "cached": True}
+
+        messages = build_messages(question, context)
+        def remember(answer):
+            if question_embed:
+                svc.answer_cache.put(session_id, question_embed, ctx_key, answer)
+
+        if data.get('stream'):
+            return stream_answer(messages, remember)
+
+        answer = await async_chat_completion(messages, temperature=0.3)
+        remember(answer)
+        return {"answer": answer}
+
+    async def send_json(self, send, status: int, payload: dict, headers: list):
+        body = json.dumps(payload).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+                       + headers
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def send_events(self, send, events, headers: list):
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", b"text/event-stream"), (b"cache-control", b"no-cache"),
+                        (b"x-accel-buffering", b"no")] + headers
+        })
+        async for event in events:
+            await send({"type": "http.response.body", "body": event.encode("utf-8"), "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+
+
+async def iter_events(events: list):
+    for event in events:
+        yield event
+
+
+async def stream_answer(messages: list, on_complete=None):
+    """Relay the provider's token stream as Server-Sent Events"""
+    try:
+        parts = []
+        async for delta in async_stream_chat_completion(messages, temperature=0.3):
+            parts.append(delta)
+            yield sse_event({"delta": delta})
+        if on_complete:
+            on_complete("".join(parts))
+        yield sse_event({}, event="done")
+    except Exception as e:
+        logger.error(f"Streaming answer failed: {str(e)}")
+        yield sse_event({"error": "Question processing failed"}, event="error")
+
+
+def create_asgi_app():
+    """ASGI application factory, called once per worker process"""
+    return AsyncAskApp(create_app())
@@ -0,0 +1,95 @@
+# Checks the shared parse pool against archives replaced in place:
+#
+#     python check_parse_pool.py
+#
+# Re-uploads to a session are saved under the same archive path, so the
+# pool's workers must read the new file rather than a reader they cached
+# for the old one, and must let go of archives once they go idle.
+import os
+import time
+import zipfile
+import tempfile
+
+os.environ["PARSE_WORKERS"] = os.getenv("PARSE_WORKERS", "2")  # The pool is skipped with one worker
+import multiprocessing
+
+import parse_pool
+from parse_pool import ParsePool, READER_IDLE_SECONDS
+from sources import ZipSource
+
+# Configuration
+FILE_COUNT = 250  # Above PARSE_POOL_MIN_FILES, so the pool is used
+
+
+def write_archive(path: str, version: int, extra: str = None):
+    with zipfile.ZipFile(path, "w") as archive:
+        for i in range(FILE_COUNT):
+            archive.writestr(f"pkg/m{i}.py", f"def f{i}_v{version}():\n    return {i}\n")
+        if extra:
+            archive.writestr(extra, "def added():\n    return True\n")
+
+
+def parse_all(path: str):
+    source = ZipSource(path)
+    try:
+        pool = ParsePool(source, min_files=0)
+        paths = source.list_files()
+        return list(pool.parse(paths)), dict(pool.hashes(paths))
+    finally:
+        source.close()
+
+
+def check_replaced_archive(directory: str):
+    """A new archive saved under the same path is read in full, not through a stale reader"""
+    path = os.path.join(directory, "session.zip")
+    write_archive(path, 1)
+    first, first_hashes = parse_all(path)
+    assert all(not result["error"] for result in first), "first run failed"
+
+    write_archive(path, 2, extra="pkg/new_file.py")
+    second, second_hashes = parse_all(path)
+    errors = [result["error"] for result in second if result["error"]]
+    assert not errors, f"{len(errors)} files failed, e.g. {errors[0]}"
+    stale = [result["path"] for result in second if "_v1(" in result["chunks"][0]["text"]]
+    assert not stale, f"{len(stale)} files read from the old archive, e.g. {stale[0]}"
+    unchanged = [path for path in first_hashes if first_hashes[path] == second_hashes.get(path)]
+    assert not unchanged, f"{len(unchanged)} changed files hashed as unchanged"
+    assert "pkg/new_file.py" in second_hashes
+
+
+def check_idle_readers_closed(directory: str):
+    """Workers close their readers once idle, so a deleted archive's space is freed"""
+    path = os.path.join(directory, "deleted.zip")
+    write_archive(path, 3)
+    parse_all(path)
+    os.remove(path)
+    time.sleep(READER_IDLE_SECONDS + 2)
+    if not os.path.isdir("/proc"):
+        return  # Open files can only be listed through /proc here
+    held = []
+    for worker in multiprocessing.active_children():
+        for fd in os.listdir(f"/proc/{worker.pid}/fd"):
+            try:
+                if os.readlink(f"/proc/{worker.pid}/fd/{fd}").startswith(path):
+                    held.append(worker.pid)
+            except OSError:
+                pass
+    assert not held, f"workers {held} still hold the deleted archive open"
+
+
+def main():
+    failed = 0
+    with tempfile.TemporaryDirectory() as directory:
+        for check in (check_replaced_archive, check_idle_readers_closed):
+            try:
+                check(directory)
+                print(f"ok    {check.__name__}")
+            except AssertionError as e:
+                failed += 1
+                print(f"FAIL  {check.__name__}: {str(e)}")
+    parse_pool.shared_pool().shutdown()
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,160 @@
+# Checks streamed answers against a local stub chat-completions server:
+#
+#     python check_streaming.py
+#
+# The stub streams raw UTF-8 Server-Sent Events with a charset-less
+# Content-Type, ": comment" and blank keep-alive lines, data after [DONE],
+# and optionally a provider error chunk mid-stream. Both
+# stream_chat_completion() and the Flask /ask route with "stream": true
+# are run against it; the index uses the offline hashing embeddings.
+import os
+import json
+import uuid
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Configuration
+DELTAS = ["héllo", " — 世界", " 👋"]  # Non-ASCII on purpose
+PROVIDER_ERROR = {"error": {"message": "Provider overloaded", "code": 502}}
+
+
+def stub_events(fail: bool) -> list:
+    events = [": OPENROUTER PROCESSING\n\n", "\n"]
+    for i, delta in enumerate(DELTAS):
+        events.append(f"data: {json.dumps({'choices': [{'delta': {'content': delta}}]}, ensure_ascii=False)}\n\n")
+        if i == 0:
+            events.append(": keep-alive\n\n")
+            if fail:
+                events.append(f"data: {json.dumps(PROVIDER_ERROR)}\n\n")
+    events.append("data: [DONE]\n\n")
+    events.append(f"data: {json.dumps({'choices': [{'delta': {'content': 'after done'}}]})}\n\n")
+    return events
+
+
+class StubChat(BaseHTTPRequestHandler):
+    """POST /chat/completions with "stream": true, streaming the server's scenario"""
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")  # No charset, like many providers
+        self.end_headers()
+        for event in stub_events(self.server.fail):
+            self.wfile.write(event.encode("utf-8"))
+            self.wfile.flush()
+
+    def log_message(self, *args):
+        pass
+
+
+def start_stub():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubChat)
+    server.fail = False
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def sse_frames(body: str) -> list:
+    """[(event, payload)] of an SSE response body"""
+    frames = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.split("\n"))
+        frames.append((fields.get("event", "message"), json.loads(fields["data"])))
+    return frames
+
+
+def check_stream_chat_completion(server, client, session_id):
+    """UTF-8 deltas come through intact; comments, keep-alives and data after [DONE] are skipped"""
+    from openrouter import stream_chat_completion
+
+    server.fail = False
+    deltas = list(stream_chat_completion([{"role": "user", "content": "hi"}]))
+    assert deltas == DELTAS, f"got {deltas!r}"
+
+
+def check_stream_provider_error(server, client, session_id):
+    """A provider error chunk mid-stream raises after the deltas before it"""
+    from openrouter import stream_chat_completion
+
+    server.fail = True
+    received = []
+    try:
+        for delta in stream_chat_completion([{"role": "user", "content": "hi"}]):
+            received.append(delta)
+    except RuntimeError as e:
+        assert "Provider overloaded" in str(e), str(e)
+    else:
+        raise AssertionError("error chunk did not raise")
+    assert received == DELTAS[:1], f"got {received!r} before the error"
+
+
+def ask_stream(client, session_id: str, question: str) -> list:
+    response = client.post("/ask", json={"session_id": session_id, "question": question, "stream": True})
+    assert response.status_code == 200, f"/ask returned {response.status_code}: {response.get_data(as_text=True)}"
+    assert response.mimetype == "text/event-stream", response.mimetype
+    return sse_frames(response.get_data(as_text=True))
+
+
+def check_flask_ask_stream(server, client, session_id):
+    """/ask relays the deltas as SSE message frames and ends with a done frame"""
+    server.fail = False
+    client.application.extensions["services"].answer_cache.invalidate(session_id)
+    frames = ask_stream(client, session_id, "What does greet do?")
+    assert frames[-1][0] == "done", f"last frame {frames[-1]!r}"
+    answer = "".join(payload["delta"] for event, payload in frames[:-1] if event == "message")
+    assert answer == "".join(DELTAS), f"got {answer!r}"
+
+
+def check_flask_ask_stream_error(server, client, session_id):
+    """A mid-stream provider error ends the /ask stream with an error frame"""
+    server.fail = True
+    client.application.extensions["services"].answer_cache.invalidate(session_id)
+    frames = ask_stream(client, session_id, "How is the greeting built?")
+    assert [event for event, _ in frames] == ["message", "error"], f"got {frames!r}"
+    assert frames[0][1] == {"delta": DELTAS[0]}, f"got {frames[0]!r}"
+    assert "error" in frames[1][1], f"got {frames[1]!r}"
+
+
+def main():
+    server = start_stub()
+    with tempfile.TemporaryDirectory() as directory:
+        # Everything the app stores goes to the temporary directory
+        for name in ("CHECKPOINT", "LEXICAL", "SUMMARY", "RATE_LIMIT"):
+            os.environ[f"{name}_DB_PATH"] = os.path.join(directory, f"{name.lower()}.sqlite3")
+        os.environ["UPLOAD_DIR"] = os.path.join(directory, "uploads")
+        os.environ["CHROMA_PATH"] = os.path.join(directory, "chroma")
+        os.environ["CHROMA_HOST"] = ""
+        os.environ["EMBED_CACHE_PATH"] = ""
+        os.environ["EMBED_BACKEND"] = "hashing"
+        os.environ["OPENROUTER_BASE_URL"] = f"http://127.0.0.1:{server.server_address[1]}"
+        from app import create_app
+        from embeddings import get_embedding
+
+        app = create_app(resume_jobs=False)
+        svc = app.extensions["services"]
+        session_id = str(uuid.uuid4())
+        document = "def greet(name):\n    return f'Hello, {name}!'"
+        metadata = {"path": "greet.py", "file": "greet.py", "start_line": 1, "end_line": 2,
+                    "chunk_index": 0, "symbols": "greet", "session_id": session_id}
+        svc.sessions.create(session_id).add(ids=["greet-0"], embeddings=[get_embedding(document)],
+                                            documents=[document], metadatas=[metadata])
+        svc.lexical_index.add(session_id, ids=["greet-0"], documents=[document], metadatas=[metadata])
+
+        failed = 0
+        client = app.test_client()
+        for check in (check_stream_chat_completion, check_stream_provider_error,
+                      check_flask_ask_stream, check_flask_ask_stream_error):
+            try:
+                check(server, client, session_id)
+                print(f"ok    {check.__name__}")
+            except AssertionError as e:
+                failed += 1
+                print(f"FAIL  {check.__name__}: {str(e)}")
+        svc.close()
+    server.shutdown()
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
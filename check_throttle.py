@@ -0,0 +1,144 @@
+# Checks the provider throttling against a local stub embeddings server:
+#
+#     python check_throttle.py
+#
+# The stub adds latency to every call and answers with scripted 429s and
+# 503s, so the limiter's halve-on-429, the Retry-After pause and the
+# jittered retry in openrouter.post() run end to end without a provider.
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+import openrouter
+from throttle import RateLimiter, backoff_delay
+
+# Configuration
+STUB_LATENCY = 0.05  # Seconds added to every stub response
+RETRY_AFTER = 1  # Seconds sent with the stub's 429s
+BACKOFF_BASE = 0.5  # backoff_delay()'s default base
+
+
+class StubEmbeddings(BaseHTTPRequestHandler):
+    """POST /embeddings, answering from the server's script of status codes, then 200"""
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        time.sleep(STUB_LATENCY)
+        with self.server.lock:
+            self.server.arrivals.append(time.monotonic())
+            status = self.server.script.pop(0) if self.server.script else 200
+
+        headers = {"Content-Type": "application/json"}
+        if status == 200:
+            payload = {"data": [{"index": i, "embedding": [0.0] * 8} for i, _ in enumerate(body.get("input", []))]}
+        else:
+            payload = {"error": {"code": status}}
+            if status == 429:
+                headers["Retry-After"] = str(RETRY_AFTER)
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_stub():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubEmbeddings)
+    server.lock = threading.Lock()
+    server.script = []
+    server.arrivals = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def reset(server, script: list):
+    with server.lock:
+        server.script = list(script)
+        server.arrivals = []
+
+
+def embed(limiter, max_retries: int = openrouter.HTTP_MAX_RETRIES):
+    return openrouter.post("/embeddings", {"input": ["x"]}, limiter=limiter, max_retries=max_retries)
+
+
+def check_halves_on_429(server):
+    """A 429 halves the rate once, however many calls of the same burst hit it"""
+    limiter = RateLimiter(8, max_rate=8, burst=8, increase=0.0)
+    reset(server, [429] * 4)
+    calls = [threading.Thread(target=embed, args=(limiter,)) for _ in range(4)]
+    for call in calls:
+        call.start()
+    for call in calls:
+        call.join()
+    assert limiter.throttled == 4, limiter.throttled
+    assert limiter.rate == 4, f"rate {limiter.rate}, expected one halving to 4"
+    assert len(server.arrivals) == 8, f"{len(server.arrivals)} requests, expected 4 throttled and 4 retried"
+
+
+def check_retry_after_pause(server):
+    """Everyone waits out Retry-After, including calls that were never throttled"""
+    limiter = RateLimiter(8, max_rate=8, burst=8)
+    reset(server, [429])
+    embed(limiter)
+    throttled_at = server.arrivals[0]
+    assert server.arrivals[1] - throttled_at >= RETRY_AFTER, "retried before Retry-After"
+
+    started = time.monotonic()
+    reset(server, [429])
+    throttled = threading.Thread(target=embed, args=(limiter,))
+    throttled.start()
+    time.sleep(STUB_LATENCY * 4)  # Let the 429 land
+    embed(limiter)  # A bystander, not throttled itself
+    assert time.monotonic() - started >= RETRY_AFTER, "bystander call ignored the Retry-After pause"
+    throttled.join()
+
+
+def check_jittered_retry(server):
+    """5xx without Retry-After are retried after random delays within the backoff cap"""
+    limiter = RateLimiter(100, max_rate=100, burst=100)
+    reset(server, [503, 503])
+    response = embed(limiter)
+    assert response.status_code == 200
+    assert len(server.arrivals) == 3, f"{len(server.arrivals)} requests, expected 2 failures and a retry"
+    for attempt, (before, after) in enumerate(zip(server.arrivals, server.arrivals[1:])):
+        cap = BACKOFF_BASE * 2 ** attempt
+        # Each gap is the jittered delay plus one stub round trip
+        assert after - before <= cap + STUB_LATENCY * 4, f"retry {attempt} waited {after - before:.2f}s"
+
+    delays = {round(backoff_delay(2), 3) for _ in range(50)}
+    assert len(delays) > 1, "backoff delays are not jittered"
+
+    reset(server, [503] * 2)
+    try:
+        embed(limiter, max_retries=1)
+    except requests.HTTPError:
+        pass
+    else:
+        raise AssertionError("gave up without raising once retries ran out")
+
+
+def main():
+    server = start_stub()
+    openrouter.OPENROUTER_BASE_URL = f"http://127.0.0.1:{server.server_address[1]}"
+    failed = 0
+    for check in (check_halves_on_429, check_retry_after_pause, check_jittered_retry):
+        try:
+            check(server)
+            print(f"ok    {check.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"FAIL  {check.__name__}: {str(e)}")
+    server.shutdown()
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
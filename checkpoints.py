@@ -0,0 +1,177 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: leases only cover this process
+    fcntl = None
+
+# Configuration
+CHECKPOINT_DB_PATH = os.getenv("CHECKPOINT_DB_PATH", "checkpoints.sqlite3")
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")  # Archives kept until their ingestion finishes
+STATUS_RETENTION = float(os.getenv("STATUS_RETENTION", "86400"))  # Seconds finished job statuses are kept
+
+
+class CheckpointStore:
+    """Unfinished ingestion runs and the files they have completed, in SQLite.
+
+    A run is recorded when its upload is accepted and removed when it
+    finishes, so whatever is left after a restart was interrupted and can
+    be resumed from its saved archive.
+
+    Every worker process on a host shares the store. A process must
+    claim() a session before ingesting it; claims are byte-range locks on
+    one file in the upload directory, so the OS drops them if the process
+    dies and its runs can be picked up by another worker. Job statuses are
+    published here too so /status works whichever worker serves it.
+    """
+
+    def __init__(self, path: str = CHECKPOINT_DB_PATH, upload_dir: str = UPLOAD_DIR):
+        self.upload_dir = upload_dir
+        os.makedirs(upload_dir, exist_ok=True)
+        self.lock = threading.Lock()
+        self.claimed = set()
+        # POSIX locks belong to the process and are lost when any of its
+        # descriptors for the file closes, so this one stays open
+        self.lock_file = open(os.path.join(upload_dir, ".ingest.lock"), "a+b")
+        self.conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS ingest_runs (
+                session_id TEXT PRIMARY KEY,
+                archive_path TEXT NOT NULL,
+                incremental INTEGER NOT NULL,
+                started_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS ingest_done (
+                session_id TEXT NOT NULL,
+                path TEXT NOT NULL,
+                PRIMARY KEY (session_id, path)
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS ingest_status (
+                session_id TEXT PRIMARY KEY,
+                data TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self.conn.commit()
+
+    def archive_path(self, session_id: str) -> str:
+        return os.path.join(self.upload_dir, f"{session_id}.zip")
+
+    def start(self, session_id: str, incremental: bool):
+        """Record a new run, forgetting any earlier progress for the session"""
+        now = time.time()
+        with self.lock:
+            self.conn.execute("DELETE FROM ingest_done WHERE session_id = ?", (session_id,))
+            self.conn.execute(
+                "INSERT OR REPLACE INTO ingest_runs (session_id, archive_path, incremental, started_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (session_id, self.archive_path(session_id), int(incremental), now, now)
+            )
+            self.conn.commit()
+
+    def mark_done(self, session_id: str, paths: list):
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO ingest_done (session_id, path) VALUES (?, ?)",
+                [(session_id, path) for path in paths]
+            )
+            self.conn.execute(
+                "UPDATE ingest_runs SET updated_at = ? WHERE session_id = ?", (time.time(), session_id)
+            )
+            self.conn.commit()
+
+    def done_paths(self, session_id: str) -> set:
+        with self.lock:
+            rows = self.conn.execute("SELECT path FROM ingest_done WHERE session_id = ?", (session_id,)).fetchall()
+        return {row[0] for row in rows}
+
+    def active(self, session_id: str) -> bool:
+        """Whether the session has a run that hasn't finished, in any process"""
+        with self.lock:
+            row = self.conn.execute("SELECT 1 FROM ingest_runs WHERE session_id = ?", (session_id,)).fetchone()
+        return row is not None
+
+    def claim(self, session_id: str) -> bool:
+        """Take the right to ingest a session; False if any process already holds it"""
+        with self.lock:
+            if session_id in self.claimed:
+                return False
+            if fcntl:
+                try:
+                    fcntl.lockf(self.lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB, 1, _lock_offset(session_id))
+                except OSError:
+                    return False
+            self.claimed.add(session_id)
+            return True
+
+    def release(self, session_id: str):
+        with self.lock:
+            if session_id not in self.claimed:
+                return
+            self.claimed.discard(session_id)
+            if fcntl:
+                fcntl.lockf(self.lock_file, fcntl.LOCK_UN, 1, _lock_offset(session_id))
+
+    def finish(self, session_id: str):
+        """Forget a run, delete its archive and release the claim on it"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT archive_path FROM ingest_runs WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            self.conn.execute("DELETE FROM ingest_runs WHERE session_id = ?", (session_id,))
+            self.conn.execute("DELETE FROM ingest_done WHERE session_id = ?", (session_id,))
+            self.conn.commit()
+        if row:
+            try:
+                os.remove(row[0])
+            except FileNotFoundError:
+                pass
+        self.release(session_id)
+
+    def unfinished(self) -> list:
+        """[(session_id, archive_path, incremental)] of runs that never finished"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT session_id, archive_path, incremental FROM ingest_runs ORDER BY started_at"
+            ).fetchall()
+        return [(session_id, path, bool(incremental)) for session_id, path, incremental in rows]
+
+    def put_status(self, session_id: str, data: dict):
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO ingest_status (session_id, data, updated_at) VALUES (?, ?, ?)",
+                (session_id, json.dumps(data), time.time())
+            )
+            self.conn.commit()
+
+    def get_status(self, session_id: str):
+        with self.lock:
+            row = self.conn.execute("SELECT data FROM ingest_status WHERE session_id = ?", (session_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def prune_status(self, max_age: float = STATUS_RETENTION):
+        with self.lock:
+            self.conn.execute("DELETE FROM ingest_status WHERE updated_at < ?", (time.time() - max_age,))
+            self.conn.commit()
+
+    def close(self):
+        with self.lock:
+            self.claimed.clear()
+            self.lock_file.close()
+            self.conn.close()
+
+
+def _lock_offset(session_id: str) -> int:
+    """Byte of the lock file standing for a session"""
+    return int.from_bytes(hashlib.sha256(session_id.encode("utf-8")).digest()[:7], "big")
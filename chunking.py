@@ -0,0 +1,255 @@
+import os
+import re
+import ast
+from pathlib import PurePosixPath
+
+# Configuration
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "1500"))  # Target characters per chunk
+JS_EXTENSIONS = {".js", ".jsx", ".ts", ".tsx"}
+
+
+def _unit(start: int, end: int, symbols: list = None) -> dict:
+    """A run of whole lines (0-based, end exclusive) that should stay together"""
+    return {"start": start, "end": end, "symbols": symbols or []}
+
+
+def _size(lines: list, unit: dict) -> int:
+    return sum(len(line) + 1 for line in lines[unit["start"]:unit["end"]])
+
+
+def _fill_gaps(units: list, total: int, begin: int = 0) -> list:
+    """Cover lines between units (imports, module code, comments) with anonymous units"""
+    filled = []
+    line = begin
+    for unit in sorted(units, key=lambda u: u["start"]):
+        if unit["start"] > line:
+            filled.append(_unit(line, unit["start"]))
+        filled.append(unit)
+        line = max(line, unit["end"])
+    if line < total:
+        filled.append(_unit(line, total))
+    return filled
+
+
+def _split_lines(lines: list, unit: dict, chunk_size: int) -> list:
+    """Split an oversized unit on line boundaries, keeping its symbols"""
+    parts = []
+    start = unit["start"]
+    length = 0
+    for idx in range(unit["start"], unit["end"]):
+        line_length = len(lines[idx]) + 1
+        if length + line_length > chunk_size and idx > start:
+            parts.append(_unit(start, idx, unit["symbols"]))
+            start, length = idx, 0
+        length += line_length
+    parts.append(_unit(start, unit["end"], unit["symbols"]))
+    return parts
+
+
+def pack_units(lines: list, units: list, chunk_size: int = CHUNK_SIZE) -> list[dict]:
+    """Merge consecutive units into chunks of up to chunk_size characters.
+
+    A unit is only split when it alone is larger than chunk_size.
+    """
+    pieces = []
+    for unit in units:
+        if _size(lines, unit) > chunk_size:
+            pieces.extend(_split_lines(lines, unit, chunk_size))
+        else:
+            pieces.append(unit)
+
+    chunks = []
+    current = None
+    for piece in pieces:
+        size = _size(lines, piece)
+        if current and current["size"] + size > chunk_size:
+            chunks.append(current)
+            current = None
+        if current is None:
+            current = {"start": piece["start"], "end": piece["end"], "symbols": [], "size": 0}
+        current["end"] = piece["end"]
+        current["size"] += size
+        current["symbols"].extend(s for s in piece["symbols"] if s not in current["symbols"])
+    if current:
+        chunks.append(current)
+
+    result = []
+    for chunk in chunks:
+        text = "\n".join(lines[chunk["start"]:chunk["end"]])
+        if not text.strip():
+            continue
+        result.append({
+            "text": text,
+            "symbols": chunk["symbols"],
+            "start_line": chunk["start"] + 1,
+            "end_line": chunk["end"],
+        })
+    return result
+
+
+def _python_units(lines: list, nodes: list, chunk_size: int, prefix: str = "") -> list:
+    units = []
+    for node in nodes:
+        if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            continue
+        start = min([node.lineno] + [d.lineno for d in node.decorator_list]) - 1
+        # Keep comments directly above a definition with it
+        while start > 0 and lines[start - 1].strip().startswith("#"):
+            start -= 1
+        name = f"{prefix}{node.name}"
+        unit = _unit(start, node.end_lineno, [name])
+
+        if isinstance(node, ast.ClassDef) and _size(lines, unit) > chunk_size:
+            # Oversized class: the header and each method become their own units
+            methods = _python_units(lines, node.body, chunk_size, prefix=f"{name}.")
+            if methods:
+                header_end = methods[0]["start"]
+                units.append(_unit(start, header_end, [name]))
+                units.extend(_fill_gaps(methods, node.end_lineno, begin=header_end))
+                continue
+        units.append(unit)
+    return units
+
+
+def chunk_python(content: str, chunk_size: int = CHUNK_SIZE) -> list[dict]:
+    """One chunk per top-level function/class, merging small neighbours"""
+    tree = ast.parse(content)
+    lines = content.split("\n")
+    units = _python_units(lines, tree.body, chunk_size)
+    return pack_units(lines, _fill_gaps(units, len(lines)), chunk_size)
+
+
+JS_SYMBOL_PATTERNS = [
+    re.compile(r"^\s*(?:export\s+)?(?:default\s+)?(?:async\s+)?function\s*\*?\s*([A-Za-z_$][\w$]*)"),
+    re.compile(r"^\s*(?:export\s+)?(?:default\s+)?(?:abstract\s+)?class\s+([A-Za-z_$][\w$]*)"),
+    re.compile(r"^\s*(?:export\s+)?(?:declare\s+)?(?:interface|type|enum)\s+([A-Za-z_$][\w$]*)"),
+    re.compile(r"^\s*(?:export\s+)?(?:const|let|var)\s+([A-Za-z_$][\w$]*)"),
+]
+REGEX_PRECEDERS = set("(,=:[!&|?{};+-*%~^")  # Not "<": JSX closing tags start with "</"
+
+
+def _regex_end(line: str, start: int) -> int:
+    """Index of the slash closing a regex literal opened at start, or start itself"""
+    i = start + 1
+    in_class = False
+    while i < len(line):
+        if line[i] == "\\":
+            i += 1
+        elif line[i] == "[":
+            in_class = True
+        elif line[i] == "]":
+            in_class = False
+        elif line[i] == "/" and not in_class:
+            return i
+        i += 1
+    return start
+
+
+def _js_statement_ends(lines: list) -> list:
+    """Line indexes where a top-level statement ends (bracket depth back to 0).
+
+    A small scanner that skips strings, template literals, comments and
+    regex literals so that braces inside them are not counted.
+    """
+    ends = []
+    depth = 0
+    stack = []  # open template literals, each with the depth its ${ started at
+    in_block_comment = False
+    in_template = False
+
+    for idx, line in enumerate(lines):
+        i = 0
+        quote = None  # Plain strings never span lines, so a stray quote (e.g. JSX text) can't leak
+        prev = ""
+        while i < len(line):
+            ch = line[i]
+            nxt = line[i + 1] if i + 1 < len(line) else ""
+            if in_block_comment:
+                if ch == "*" and nxt == "/":
+                    in_block_comment = False
+                    i += 1
+            elif in_template:
+                if ch == "\\":
+                    i += 1
+                elif ch == "`":
+                    in_template = False
+                elif ch == "$" and nxt == "{":
+                    stack.append(depth)
+                    depth += 1
+                    in_template = False
+                    i += 1
+            elif quote:
+                if ch == "\\":
+                    i += 1
+                elif ch == quote:
+                    quote = None
+            elif ch == "/" and nxt == "/":
+                break
+            elif ch == "/" and nxt == "*":
+                in_block_comment = True
+                i += 1
+            elif ch in ("'", '"'):
+                quote = ch
+            elif ch == "`":
+                in_template = True
+            elif ch == "/" and (prev == "" or prev in REGEX_PRECEDERS):
+                # Regex literal: skip to its closing slash (if none, it was a division)
+                i = _regex_end(line, i)
+            elif ch in "{([":
+                depth += 1
+            elif ch in "})]":
+                depth = max(0, depth - 1)
+                if ch == "}" and stack and stack[-1] == depth:
+                    stack.pop()
+                    in_template = True
+            if not ch.isspace():
+                prev = ch
+            i += 1
+        if depth == 0 and not in_block_comment and not in_template:
+            ends.append(idx)
+    return ends
+
+
+def chunk_javascript(content: str, chunk_size: int = CHUNK_SIZE) -> list[dict]:
+    """One chunk per top-level function/class/declaration, merging small neighbours"""
+    lines = content.split("\n")
+    units = []
+    start = 0
+    for end in _js_statement_ends(lines):
+        symbols = []
+        for line in lines[start:end + 1]:
+            if not line.strip() or line.strip().startswith(("//", "/*", "*")):
+                continue
+            for pattern in JS_SYMBOL_PATTERNS:
+                match = pattern.match(line)
+                if match:
+                    symbols.append(match.group(1))
+                    break
+            break
+        units.append(_unit(start, end + 1, symbols))
+        start = end + 1
+    if start < len(lines):
+        units.append(_unit(start, len(lines)))
+    return pack_units(lines, units, chunk_size)
+
+
+def chunk_lines(content: str, chunk_size: int = CHUNK_SIZE) -> list[dict]:
+    """Syntax-agnostic fallback: split on line boundaries"""
+    lines = content.split("\n")
+    return pack_units(lines, [_unit(0, len(lines))], chunk_size)
+
+
+# Extension -> chunker; anything else is split by lines
+CHUNKERS = {".py": chunk_python}
+CHUNKERS.update({ext: chunk_javascript for ext in JS_EXTENSIONS})
+
+
+def chunk_file(path: str, content: str, chunk_size: int = CHUNK_SIZE) -> list[dict]:
+    """Chunk a source file into {"text", "symbols", "start_line", "end_line"} dicts"""
+    chunker = CHUNKERS.get(PurePosixPath(path).suffix.lower())
+    if chunker:
+        try:
+            return chunker(content, chunk_size)
+        except (SyntaxError, ValueError, RecursionError):
+            pass  # Unparseable source still gets indexed
+    return chunk_lines(content, chunk_size)
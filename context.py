@@ -0,0 +1,148 @@
+import os
+
+from dedup import duplicate_locations
+from embeddings import estimate_tokens
+
+# Configuration
+ASK_CONTEXT_TOKENS = int(os.getenv("ASK_CONTEXT_TOKENS", "1500"))  # Approx token budget for code in an /ask prompt
+HEADER_TOKENS = 12  # Rough cost of a "From path:lines" line
+
+
+class Block:
+    """A run of lines from one file, built from one or more retrieved chunks"""
+
+    def __init__(self, rank: int, meta: dict, start: int = None, lines: list = None, text: str = None):
+        self.rank = rank  # Best (lowest) rank among its chunks
+        self.metas = [meta]
+        self.path = meta.get('path', '')
+        self.start = start  # First line number, or None for chunks without line numbers
+        self.lines = lines or []
+        self.text = text
+
+    @property
+    def end(self) -> int:
+        return self.start + len(self.lines) - 1
+
+    def render(self) -> str:
+        if self.start is None:
+            return f"From {self.source()}:\n{self.text}"
+        return f"From {self.source(f':{self.start}-{self.end}')}:\n" + "\n".join(self.lines)
+
+    def source(self, lines: str = "") -> str:
+        """Where the block comes from, including its chunks' deduplicated copies"""
+        others = {location['path'] for meta in self.metas for location in duplicate_locations(meta)}
+        others = sorted(others - {self.path})
+        if not others:
+            return f"{self.path}{lines}"
+        return f"{self.path}{lines} (also in {', '.join(others)})"
+
+
+def numbered_lines(document: str, meta: dict):
+    """(first line number, lines) of a chunk, or (None, None) if its line numbers can't be trusted"""
+    start, end = meta.get('start_line'), meta.get('end_line')
+    lines = document.split("\n")
+    if not isinstance(start, int) or not isinstance(end, int) or end - start + 1 != len(lines):
+        return None, None
+    return start, lines
+
+
+def pack_context(documents: list, metadatas: list, budget: int = ASK_CONTEXT_TOKENS):
+    """Pack ranked chunks into prompt context within a token budget.
+
+    Chunks are taken best first while they fit, skipping any that would
+    overflow so smaller, lower-ranked ones can still use the space.
+    Lines already taken from the same file are not repeated, so
+    overlapping chunks only cost their new lines and fully covered ones
+    are dropped; chunks that touch are merged into one block under a
+    single header. The top chunk is always included, cut to the budget
+    if it is larger. Returns (context text, indexes of chunks used).
+    """
+    blocks = []
+    taken = {}  # path -> {line number: text} already in the context
+    texts = set()  # Chunks without line numbers, to drop repeats
+    used = []
+    remaining = budget
+
+    for rank, (document, meta) in enumerate(zip(documents, metadatas)):
+        start, lines = numbered_lines(document, meta)
+        if start is None:
+            if document in texts:
+                continue
+            cost = estimate_tokens(document) + HEADER_TOKENS
+            if cost > remaining:
+                if blocks:
+                    continue
+                cost = remaining
+            texts.add(document)
+            blocks.append(Block(rank, meta, text=document[:max(0, remaining - HEADER_TOKENS) * 4]))
+            used.append(rank)
+            remaining -= cost
+            continue
+
+        path = meta.get('path', '')
+        seen = taken.setdefault(path, {})
+        new = [(start + offset, line) for offset, line in enumerate(lines) if start + offset not in seen]
+        if not new:
+            continue  # Fully covered by chunks already taken
+        cost = estimate_tokens("\n".join(line for _, line in new))
+        touches = any(number - 1 in seen or number + 1 in seen for number, _ in new)
+        if not touches:
+            cost += HEADER_TOKENS
+        if cost > remaining:
+            if blocks:
+                continue
+            # The best chunk alone is over budget: keep as many of its lines as fit
+            new = _truncate(new, remaining - HEADER_TOKENS)
+            cost = remaining
+
+        for number, line in new:
+            seen[number] = line
+        used.append(rank)
+        remaining -= cost
+        blocks.append(Block(rank, meta, start=new[0][0]))
+
+    return "\n\n".join(block.render() for block in _merge(blocks, taken)), used
+
+
+def _truncate(numbered: list, budget: int) -> list:
+    kept, tokens = [], 0
+    for number, line in numbered:
+        tokens += len(line) // 4 + 1
+        if tokens > budget:
+            if not kept:
+                # Even the first line is too long (e.g. minified code): keep its start
+                kept.append((number, line[:max(0, budget - 1) * 4]))
+            break
+        kept.append((number, line))
+    return kept
+
+
+def _merge(blocks: list, taken: dict) -> list:
+    """One block per contiguous run of taken lines, ordered by the best chunk in it"""
+    merged = [block for block in blocks if block.start is None]
+    by_path = {}
+    for block in blocks:
+        if block.start is not None:
+            by_path.setdefault(block.path, []).append(block)
+
+    for path, members in by_path.items():
+        numbers = sorted(taken[path])
+        runs, run = [], [numbers[0]]
+        for number in numbers[1:]:
+            if number == run[-1] + 1:
+                run.append(number)
+            else:
+                runs.append(run)
+                run = [number]
+        runs.append(run)
+
+        for run in runs:
+            inside = [block for block in members if run[0] <= block.start <= run[-1]]
+            if not inside:
+                continue
+            best = min(inside, key=lambda block: block.rank)
+            block = Block(best.rank, best.metas[0], start=run[0], lines=[taken[path][number] for number in run])
+            block.metas = [member.metas[0] for member in sorted(inside, key=lambda member: member.rank)]
+            merged.append(block)
+
+    return sorted(merged, key=lambda block: block.rank)
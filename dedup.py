@@ -0,0 +1,101 @@
+import os
+import re
+import json
+import hashlib
+
+import numpy as np
+
+# Configuration
+NEAR_DUP_DISTANCE = int(os.getenv("NEAR_DUP_DISTANCE", "3"))  # Max differing SimHash bits; -1 disables near-dup matching
+NEAR_DUP_MIN_CHARS = int(os.getenv("NEAR_DUP_MIN_CHARS", "200"))  # Shorter chunks only match exactly
+NEAR_DUP_MAX_LENGTH_DIFF = 0.1  # Near duplicates differ in length by at most 10%
+SIMHASH_BITS = 64
+SHINGLE_SIZE = 3
+
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+
+def normalize(text: str) -> str:
+    """Collapse whitespace so re-indented copies hash the same"""
+    return " ".join(text.split())
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(normalize(text).encode("utf-8")).hexdigest()
+
+
+def simhash(text: str) -> int:
+    """64-bit SimHash over token shingles; similar texts differ in few bits"""
+    tokens = TOKEN_PATTERN.findall(text)
+    if len(tokens) > SHINGLE_SIZE:
+        shingles = [" ".join(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1)]
+    else:
+        shingles = [" ".join(tokens)]
+
+    # One row of 64 bits per shingle hash; each bit is set by majority vote
+    digests = b"".join(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest() for shingle in shingles)
+    bits = np.unpackbits(np.frombuffer(digests, dtype=np.uint8).reshape(-1, SIMHASH_BITS // 8), axis=1)
+    majority = bits.sum(axis=0) * 2 > len(shingles)
+    return int.from_bytes(np.packbits(majority).tobytes(), "big")
+
+
+def fingerprint(text: str) -> tuple:
+    """(content hash, SimHash or None if too short for near matching), for Deduplicator.seen"""
+    near = NEAR_DUP_DISTANCE >= 0 and len(text) >= NEAR_DUP_MIN_CHARS
+    return content_hash(text), simhash(text) if near else None
+
+
+class Deduplicator:
+    """Finds chunks already seen in this run, exactly or nearly.
+
+    Exact copies are matched by a hash of the whitespace-normalized text.
+    Near copies (a changed comment, a renamed variable) are matched by
+    SimHash Hamming distance, and must define the same symbols so that
+    look-alike code with different names is kept. The fingerprint is split
+    into bands so a lookup only compares against chunks sharing at least
+    one band, which is guaranteed for any match within ``max_distance`` bits.
+    """
+
+    def __init__(self, max_distance: int = NEAR_DUP_DISTANCE, min_chars: int = NEAR_DUP_MIN_CHARS):
+        self.max_distance = max_distance
+        self.min_chars = min_chars
+        self.exact = {}  # content hash -> canonical chunk id
+        self.band_count = max_distance + 1
+        self.band_bits = SIMHASH_BITS // self.band_count if max_distance >= 0 else 0
+        self.bands = [{} for _ in range(self.band_count)] if max_distance >= 0 else []
+
+    def _bands(self, fingerprint: int) -> list:
+        mask = (1 << self.band_bits) - 1
+        return [fingerprint >> (i * self.band_bits) & mask for i in range(self.band_count)]
+
+    def seen(self, text: str, chunk_id: str, symbols: list = (), fingerprints: tuple = None):
+        """Id of an earlier chunk this one duplicates, or None after registering it.
+
+        ``fingerprints`` may carry a precomputed fingerprint() of the text.
+        """
+        key, fingerprint = fingerprints or (content_hash(text), None)
+        if key in self.exact:
+            return self.exact[key]
+        self.exact[key] = chunk_id
+        if not self.bands or len(text) < self.min_chars:
+            return None
+
+        if fingerprint is None:
+            fingerprint = simhash(text)
+        values = self._bands(fingerprint)
+        for band, value in zip(self.bands, values):
+            for other, length, other_symbols, other_id in band.get(value, ()):
+                if (other_symbols == tuple(symbols)
+                        and abs(length - len(text)) <= NEAR_DUP_MAX_LENGTH_DIFF * max(length, len(text))
+                        and bin(fingerprint ^ other).count("1") <= self.max_distance):
+                    self.exact[key] = other_id
+                    return other_id
+        for band, value in zip(self.bands, values):
+            band.setdefault(value, []).append((fingerprint, len(text), tuple(symbols), chunk_id))
+        return None
+
+
+def duplicate_locations(metadata: dict) -> list:
+    """Other places a stored chunk's text appears, as recorded at ingest"""
+    raw = metadata.get("duplicates")
+    return json.loads(raw) if raw else []
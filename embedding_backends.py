@@ -0,0 +1,142 @@
+import os
+import math
+import hashlib
+import logging
+import threading
+from collections import Counter
+
+import openrouter
+from throttle import RateLimiter
+from lexical import tokenize
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+EMBED_BACKEND = os.getenv("EMBED_BACKEND", "openrouter")  # openrouter | local | hashing
+EMBEDDING_MODEL = "mistralai/mistral-embed"
+EMBEDDING_DIM = 768
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))  # Max inputs per request
+EMBED_BATCH_TOKENS = int(os.getenv("EMBED_BATCH_TOKENS", "12000"))  # Approx token budget per request
+EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", "4"))  # Concurrent embedding requests
+EMBED_RATE = float(os.getenv("EMBED_RATE", "5"))  # Starting requests/second
+EMBED_MAX_RATE = float(os.getenv("EMBED_MAX_RATE", "20"))  # Ceiling the limiter can grow to
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "5"))
+LOCAL_EMBED_MODEL = os.getenv("LOCAL_EMBED_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+LOCAL_EMBED_BATCH_SIZE = int(os.getenv("LOCAL_EMBED_BATCH_SIZE", "32"))  # Texts per forward pass
+HASH_EMBED_DIM = int(os.getenv("HASH_EMBED_DIM", "1024"))
+
+# Shared by every ingestion job and /ask so the provider sees one client
+embedding_limiter = RateLimiter(EMBED_RATE, max_rate=EMBED_MAX_RATE)
+
+
+class OpenRouterBackend:
+    """Remote embeddings over the OpenRouter API, paced by the shared limiter"""
+
+    use_cache = True
+    max_batch_size = EMBED_BATCH_SIZE
+    max_batch_tokens = EMBED_BATCH_TOKENS
+    workers = EMBED_WORKERS
+
+    def __init__(self, model: str = EMBEDDING_MODEL, dim: int = EMBEDDING_DIM):
+        self.model_id = model
+        self.dim = dim
+
+    def embed(self, texts: list[str]) -> list[list]:
+        """Embed several texts in a single request, returned in input order"""
+        response = openrouter.post(
+            "/embeddings",
+            {"model": self.model_id, "input": texts},
+            read_timeout=30,
+            limiter=embedding_limiter,
+            max_retries=EMBED_MAX_RETRIES
+        )
+        return self._parse(response.json(), texts)
+
+    async def embed_async(self, texts: list[str]) -> list[list]:
+        """embed() for coroutines"""
+        response = await openrouter.async_post(
+            "/embeddings",
+            {"model": self.model_id, "input": texts},
+            read_timeout=30,
+            limiter=embedding_limiter,
+            max_retries=EMBED_MAX_RETRIES
+        )
+        return self._parse(response.json(), texts)
+
+    def _parse(self, body: dict, texts: list[str]) -> list[list]:
+        data = body["data"]
+        if len(data) != len(texts):
+            raise RuntimeError(f"Expected {len(texts)} embeddings, got {len(data)}")
+
+        embeddings = [None] * len(texts)
+        for position, item in enumerate(data):
+            # Providers usually return items in order, but "index" is authoritative
+            embeddings[item.get("index", position)] = item["embedding"]
+        return embeddings
+
+
+class SentenceTransformerBackend:
+    """A small sentence-transformers model on the CPU (optional dependency)"""
+
+    use_cache = True
+    max_batch_size = 256
+    max_batch_tokens = 10 ** 9  # Batches are bounded by count only
+    workers = 1  # The model already uses every core
+
+    def __init__(self, model: str = LOCAL_EMBED_MODEL):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model, device="cpu")
+        self.model_id = model
+        self.dim = self.model.get_sentence_embedding_dimension()
+        self.lock = threading.Lock()
+
+    def embed(self, texts: list[str]) -> list[list]:
+        with self.lock:
+            vectors = self.model.encode(texts, batch_size=LOCAL_EMBED_BATCH_SIZE,
+                                        normalize_embeddings=True, convert_to_numpy=True)
+        return vectors.tolist()
+
+
+class HashingBackend:
+    """Dependency-free fallback: signed feature hashing of identifier-aware tokens.
+
+    Only lexical similarity is captured, but it is fast, deterministic and
+    needs no model download or network.
+    """
+
+    use_cache = False  # Cheaper to recompute than to look up
+    max_batch_size = 1000
+    max_batch_tokens = 10 ** 9
+    workers = 1
+
+    def __init__(self, dim: int = HASH_EMBED_DIM):
+        self.model_id = f"hashing-{dim}"
+        self.dim = dim
+
+    def embed_one(self, text: str) -> list:
+        vector = [0.0] * self.dim
+        for term, count in Counter(tokenize(text)).items():
+            digest = int.from_bytes(hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest(), "big")
+            sign = 1.0 if digest >> 63 else -1.0
+            vector[digest % self.dim] += sign * (1.0 + math.log(count))
+        norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+        return [x / norm for x in vector]
+
+    def embed(self, texts: list[str]) -> list[list]:
+        return [self.embed_one(text) for text in texts]
+
+
+def make_backend(name: str = EMBED_BACKEND):
+    """Build the configured embedding backend"""
+    if name == "openrouter":
+        return OpenRouterBackend()
+    if name == "hashing":
+        return HashingBackend()
+    if name == "local":
+        try:
+            return SentenceTransformerBackend()
+        except Exception as e:
+            logger.warning(f"Local embedding model unavailable ({str(e)}), using hashing embeddings")
+            return HashingBackend()
+    raise ValueError(f"Unknown EMBED_BACKEND: {name}")
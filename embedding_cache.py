@@ -0,0 +1,188 @@
+import os
+import time
+import array
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", "embedding_cache.sqlite3")  # Empty disables the cache
+EMBED_CACHE_MAX_MB = int(os.getenv("EMBED_CACHE_MAX_MB", "1024"))
+EVICT_EVERY = 1000  # Check the size cap after this many inserts
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "2048"))  # Question embeddings kept in memory; 0 disables
+
+
+class EmbeddingCache:
+    """Disk-backed embedding cache keyed on a hash of (model, text).
+
+    Vectors are stored as float32 blobs in SQLite. When the stored vectors
+    exceed ``max_bytes`` the least recently used entries are evicted.
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.inserts_since_evict = 0
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON embeddings(last_used)")
+        self.conn.commit()
+
+    @staticmethod
+    def key(model: str, text: str) -> str:
+        return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, keys: list[str]) -> dict:
+        """Return {key: vector} for the keys that are cached"""
+        found = {}
+        unique = list(dict.fromkeys(keys))
+        with self.lock:
+            for start in range(0, len(unique), 500):  # Stay under SQLite's variable limit
+                part = unique[start:start + 500]
+                placeholders = ",".join("?" * len(part))
+                rows = self.conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", part
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = array.array("f", blob).tolist()
+                if rows:
+                    self.conn.execute(
+                        f"UPDATE embeddings SET last_used = ? WHERE key IN ({placeholders})",
+                        [time.time()] + part
+                    )
+            self.conn.commit()
+            self.hits += len(found)
+            self.misses += len(unique) - len(found)
+        return found
+
+    def get(self, key: str):
+        return self.get_many([key]).get(key)
+
+    def put_many(self, items: dict):
+        """Store {key: vector} pairs"""
+        if not items:
+            return
+        now = time.time()
+        rows = [(key, array.array("f", vector).tobytes(), now) for key, vector in items.items()]
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)", rows
+            )
+            self.conn.commit()
+            self.inserts_since_evict += len(rows)
+            if self.inserts_since_evict >= EVICT_EVERY:
+                self._evict()
+
+    def put(self, key: str, vector: list):
+        self.put_many({key: vector})
+
+    def _evict(self):
+        """Drop least recently used entries until under the size cap (lock held)"""
+        self.inserts_since_evict = 0
+        total = self.conn.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        rows = self.conn.execute("SELECT key, LENGTH(vector) FROM embeddings ORDER BY last_used")
+        doomed = []
+        for key, size in rows:
+            doomed.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        self.conn.executemany("DELETE FROM embeddings WHERE key = ?", doomed)
+        self.conn.commit()
+        self.evictions += len(doomed)
+        logger.info(f"Embedding cache evicted {len(doomed)} entries")
+
+    def stats(self) -> dict:
+        with self.lock:
+            entries, size = self.conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+            ).fetchone()
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                "evictions": self.evictions,
+                "entries": entries,
+                "bytes": size,
+            }
+
+
+class QueryEmbeddingCache:
+    """In-memory LRU of question embeddings, keyed on (model, normalized text).
+
+    Checked before the disk cache and the provider, so a question repeated
+    by a dashboard or a client retry costs a dict lookup.
+    """
+
+    def __init__(self, max_entries: int = QUERY_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # (model, text) -> vector, least recently used first
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Collapse whitespace so trivially different copies of a question share an entry"""
+        return " ".join(text.split())
+
+    def get(self, model: str, text: str):
+        with self.lock:
+            vector = self.entries.get((model, text))
+            if vector is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end((model, text))
+            self.hits += 1
+            return vector
+
+    def put(self, model: str, text: str, vector: list):
+        with self.lock:
+            self.entries[(model, text)] = vector
+            self.entries.move_to_end((model, text))
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                "evictions": self.evictions,
+                "entries": len(self.entries),
+                "max_entries": self.max_entries,
+            }
+
+
+def open_cache():
+    """Open the configured cache, or None when disabled or unavailable"""
+    if not EMBED_CACHE_PATH:
+        return None
+    try:
+        return EmbeddingCache(EMBED_CACHE_PATH, EMBED_CACHE_MAX_MB * 1024 * 1024)
+    except sqlite3.Error as e:
+        logger.error(f"Embedding cache disabled: {str(e)}")
+        return None
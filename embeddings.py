@@ -0,0 +1,173 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from embedding_cache import EmbeddingCache, QueryEmbeddingCache, open_cache, QUERY_CACHE_SIZE
+from embedding_backends import make_backend, EMBED_BATCH_SIZE, EMBED_BATCH_TOKENS, EMBED_WORKERS
+
+logger = logging.getLogger(__name__)
+
+# Selected by EMBED_BACKEND: remote API, local model, or hashing fallback
+backend = make_backend()
+
+# Persistent cache so unchanged chunks are never embedded twice
+embedding_cache = open_cache() if backend.use_cache else None
+
+# Recent /ask questions, so repeats skip the disk cache and the network
+query_cache = QueryEmbeddingCache() if QUERY_CACHE_SIZE > 0 else None
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token)"""
+    return len(text) // 4 + 1
+
+
+def _recent_query(text: str):
+    """(normalized text, embedding from the in-memory LRU or None) for a question"""
+    text = QueryEmbeddingCache.normalize(text)
+    return text, query_cache.get(backend.model_id, text) if query_cache else None
+
+
+def _stored_query(text: str):
+    """(disk cache key, cached embedding or None) for a normalized question; hits are promoted to the LRU"""
+    key = EmbeddingCache.key(backend.model_id, text)
+    cached = embedding_cache.get(key) if embedding_cache else None
+    if cached is not None and query_cache:
+        query_cache.put(backend.model_id, text, cached)
+    return key, cached
+
+
+def _remember_query(text: str, key: str, embedding: list):
+    if embedding_cache:
+        embedding_cache.put(key, embedding)
+    if query_cache:
+        query_cache.put(backend.model_id, text, embedding)
+
+
+def get_embedding(text: str) -> list:
+    """Get text embedding with error handling"""
+    if not text.strip():
+        return [0.0] * backend.dim
+
+    text, cached = _recent_query(text)
+    if cached is not None:
+        return cached
+    key, cached = _stored_query(text)
+    if cached is not None:
+        return cached
+
+    try:
+        embedding = backend.embed([text])[0]
+    except Exception as e:
+        logger.error(f"Embedding error: {str(e)}")
+        raise
+
+    _remember_query(text, key, embedding)
+    return embedding
+
+
+async def get_embedding_async(text: str) -> list:
+    """get_embedding() for coroutines; local backends run on a worker thread"""
+    if not text.strip():
+        return [0.0] * backend.dim
+
+    text, cached = _recent_query(text)
+    if cached is not None:
+        return cached
+    # The disk cache is SQLite: keep its reads and writes off the event loop
+    key, cached = await asyncio.to_thread(_stored_query, text)
+    if cached is not None:
+        return cached
+
+    try:
+        if hasattr(backend, "embed_async"):
+            embedding = (await backend.embed_async([text]))[0]
+        else:
+            embedding = (await asyncio.to_thread(backend.embed, [text]))[0]
+    except Exception as e:
+        logger.error(f"Embedding error: {str(e)}")
+        raise
+
+    await asyncio.to_thread(_remember_query, text, key, embedding)
+    return embedding
+
+
+def make_batches(texts: list[str], max_batch_size: int = EMBED_BATCH_SIZE,
+                 max_batch_tokens: int = EMBED_BATCH_TOKENS) -> list[list[int]]:
+    """Group text indexes into batches bounded by count and token budget"""
+    batches = []
+    current = []
+    current_tokens = 0
+
+    for idx, text in enumerate(texts):
+        tokens = estimate_tokens(text)
+        if current and (len(current) >= max_batch_size or current_tokens + tokens > max_batch_tokens):
+            batches.append(current)
+            current = []
+            current_tokens = 0
+        current.append(idx)
+        current_tokens += tokens
+
+    if current:
+        batches.append(current)
+    return batches
+
+
+def get_embeddings(texts: list[str], max_batch_size: int = None, max_batch_tokens: int = None,
+                   workers: int = None, return_exceptions: bool = False) -> list[list]:
+    """Embed many texts using as few requests as possible.
+
+    Cached and repeated texts are resolved first; the rest are sent in
+    batches concurrently on up to ``workers`` threads (batch limits and
+    workers default to the backend's). With ``return_exceptions`` a failed
+    batch leaves ``None`` for its texts instead of raising.
+    """
+    max_batch_size = max_batch_size or backend.max_batch_size
+    max_batch_tokens = max_batch_tokens or backend.max_batch_tokens
+    workers = workers or backend.workers
+
+    embeddings = [None] * len(texts)
+    keys = [EmbeddingCache.key(backend.model_id, text) for text in texts]
+    cached = embedding_cache.get_many(keys) if embedding_cache else {}
+
+    # Blank and cached texts never hit the network, and each distinct text is sent once
+    pending = []
+    positions = {}
+    for idx, text in enumerate(texts):
+        if not text.strip():
+            embeddings[idx] = [0.0] * backend.dim
+        elif keys[idx] in cached:
+            embeddings[idx] = cached[keys[idx]]
+        elif keys[idx] in positions:
+            positions[keys[idx]].append(idx)
+        else:
+            positions[keys[idx]] = [idx]
+            pending.append(idx)
+
+    pending_texts = [texts[idx] for idx in pending]
+    batches = make_batches(pending_texts, max_batch_size, max_batch_tokens)
+    if not batches:
+        return embeddings
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(batches)))) as executor:
+        futures = [
+            (batch, executor.submit(backend.embed, [pending_texts[i] for i in batch]))
+            for batch in batches
+        ]
+        for batch, future in futures:
+            try:
+                vectors = future.result()
+            except Exception as e:
+                logger.error(f"Embedding batch error: {str(e)}")
+                if not return_exceptions:
+                    raise
+                continue
+            fresh = {}
+            for i, vector in zip(batch, vectors):
+                key = keys[pending[i]]
+                fresh[key] = vector
+                for idx in positions[key]:
+                    embeddings[idx] = vector
+            if embedding_cache:
+                embedding_cache.put_many(fresh)
+    return embeddings
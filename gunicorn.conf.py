@@ -0,0 +1,22 @@
+# Production server settings: run `gunicorn` from this directory
+# (or `gunicorn "app:create_app()"` to override them on the command line).
+#
+# Each worker builds its own services in create_app(). With more than one
+# worker, point CHROMA_HOST at a Chroma server and set RATE_LIMIT_BACKEND=sqlite
+# so the workers share vectors and request limits.
+import os
+
+wsgi_app = "app:create_app()"
+bind = os.getenv("BIND", "0.0.0.0:5000")
+workers = int(os.getenv("WEB_WORKERS", "1"))
+threads = int(os.getenv("WEB_THREADS", "8"))  # Requests mostly wait on the LLM provider
+timeout = int(os.getenv("WEB_TIMEOUT", "120"))  # Non-streamed answers can take a while
+preload_app = False  # Connections and threads must be created after the fork
+
+
+def worker_exit(server, worker):
+    """Stop the worker's job runner before the interpreter waits on its threads"""
+    app = getattr(worker, "wsgi", None)
+    services = app.extensions.get("services") if app else None
+    if services:
+        services.close()
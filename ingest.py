@@ -0,0 +1,404 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from pathlib import PurePosixPath
+
+from embeddings import get_embeddings, EMBED_BATCH_SIZE, EMBED_WORKERS
+from parse_pool import ParsePool
+from sources import DirectorySource, ZipSource
+from dedup import Deduplicator, duplicate_locations
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+WRITE_BATCH_SIZE = int(os.getenv("WRITE_BATCH_SIZE", "1000"))  # Chunks per collection.upsert
+WRITE_FLUSH_SECONDS = float(os.getenv("WRITE_FLUSH_SECONDS", "5"))  # Max time a chunk sits in the buffer
+CHECKPOINT_SECONDS = float(os.getenv("CHECKPOINT_SECONDS", "30"))  # Max work redone after a crash
+
+
+class IngestProgress:
+    """Thread-safe counters for one ingestion run"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.files_total = 0
+        self.files_scanned = 0
+        self.chunks_embedded = 0
+        self.chunks_written = 0
+        self.chunks_deduplicated = 0
+        self.chunks_reused = 0
+        self.files_unchanged = 0
+        self.files_removed = 0
+        self.files_resumed = 0
+        self.failures = 0
+        self.started_at = None
+
+    def set_total(self, files_total: int):
+        with self.lock:
+            self.files_total = files_total
+
+    def add(self, **counts):
+        with self.lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def eta_seconds(self):
+        """Estimate remaining time from the file scan rate so far"""
+        with self.lock:
+            if not self.started_at or not self.files_scanned or not self.files_total:
+                return None
+            elapsed = time.time() - self.started_at
+            remaining = self.files_total - self.files_scanned
+            return round(elapsed / self.files_scanned * remaining, 1)
+
+    def to_dict(self):
+        with self.lock:
+            counts = {
+                "files_total": self.files_total,
+                "files_scanned": self.files_scanned,
+                "chunks_embedded": self.chunks_embedded,
+                "chunks_written": self.chunks_written,
+                "chunks_deduplicated": self.chunks_deduplicated,
+                "chunks_reused": self.chunks_reused,
+                "files_unchanged": self.files_unchanged,
+                "files_removed": self.files_removed,
+                "files_resumed": self.files_resumed,
+                "failures": self.failures,
+            }
+        counts["eta_seconds"] = self.eta_seconds()
+        return counts
+
+
+class ChunkWriter:
+    """Buffers embedded chunks and writes them to a collection in bulk.
+
+    The buffer is flushed when it reaches ``max_batch`` chunks or when the
+    oldest buffered chunk has waited ``max_delay`` seconds.
+    """
+
+    def __init__(self, collection, max_batch: int = WRITE_BATCH_SIZE,
+                 max_delay: float = WRITE_FLUSH_SECONDS, progress: IngestProgress = None):
+        self.collection = collection
+        self.progress = progress
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.documents = []
+        self.embeddings = []
+        self.metadatas = []
+        self.ids = []
+        self.first_buffered_at = None
+        self.written = 0
+        self.failed = 0
+        self.failed_paths = set()  # Files with chunks that could not be written
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.flush()
+        return False
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, documents: list, embeddings: list, metadatas: list, ids: list):
+        """Buffer chunks, flushing if the size or time limit is reached"""
+        if not self.ids:
+            self.first_buffered_at = time.monotonic()
+        self.documents.extend(documents)
+        self.embeddings.extend(embeddings)
+        self.metadatas.extend(metadatas)
+        self.ids.extend(ids)
+
+        if len(self.ids) >= self.max_batch:
+            self.flush()
+        else:
+            self.flush_if_due()
+
+    def flush_if_due(self):
+        if self.ids and time.monotonic() - self.first_buffered_at >= self.max_delay:
+            self.flush()
+
+    def flush(self) -> int:
+        """Write everything buffered in as few collection.upsert calls as possible"""
+        written = 0
+        for start in range(0, len(self.ids), self.max_batch):
+            end = start + self.max_batch
+            try:
+                self.collection.upsert(
+                    documents=self.documents[start:end],
+                    embeddings=self.embeddings[start:end],
+                    metadatas=self.metadatas[start:end],
+                    ids=self.ids[start:end]
+                )
+                written += len(self.ids[start:end])
+            except Exception as e:
+                self.failed += len(self.ids[start:end])
+                self.failed_paths.update(metadata.get("path") for metadata in self.metadatas[start:end])
+                if self.progress:
+                    self.progress.add(failures=len(self.ids[start:end]))
+                logger.error(f"Write error ({len(self.ids[start:end])} chunks): {str(e)}")
+
+        self.documents, self.embeddings, self.metadatas, self.ids = [], [], [], []
+        self.first_buffered_at = None
+        self.written += written
+        if self.progress:
+            self.progress.add(chunks_written=written)
+        return written
+
+
+def load_file_index(collection, session_id: str, page_size: int = 5000) -> dict:
+    """Map each stored path of a session to its file hash, chunk ids and the
+    paths it shares deduplicated chunks with"""
+    index = {}
+
+    def entry(path, file_hash):
+        return index.setdefault(path, {"hash": file_hash, "ids": [], "linked": set()})
+
+    offset = 0
+    while True:
+        results = collection.get(
+            where={"session_id": session_id},
+            include=["metadatas"],
+            limit=page_size,
+            offset=offset
+        )
+        for chunk_id, meta in zip(results["ids"], results["metadatas"]):
+            owner = entry(meta["path"], meta.get("file_hash"))
+            if owner["hash"] != meta.get("file_hash"):
+                owner["hash"] = None  # Chunks from two versions of the file: treat it as changed
+            owner["ids"].append(chunk_id)
+            for location in duplicate_locations(meta):
+                entry(location["path"], location["file_hash"])["linked"].add(meta["path"])
+                owner["linked"].add(location["path"])
+        if len(results["ids"]) < page_size:
+            return index
+        offset += page_size
+
+
+def delete_chunks(collection, ids: list, batch_size: int = WRITE_BATCH_SIZE):
+    for start in range(0, len(ids), batch_size):
+        collection.delete(ids=ids[start:start + batch_size])
+
+
+def make_chunk_id(session_id: str, path: str, text: str) -> str:
+    """Content-derived id: the same chunk of the same file always gets the same id"""
+    return f"{session_id}:{path}:{hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]}"
+
+
+def find_dirty(parser: ParsePool, paths: list, stored: dict) -> set:
+    """Stored paths whose chunks must be rebuilt: removed or changed files,
+    plus every file sharing a deduplicated chunk with one of them"""
+    current_paths = set(paths)
+    dirty = {path for path in stored if path not in current_paths}
+    for path, file_hash in parser.hashes([path for path in paths if path in stored]):
+        # Unreadable files (None) are reported when they are processed
+        if file_hash is None or file_hash != stored[path]["hash"]:
+            dirty.add(path)
+
+    return with_linked(stored, dirty)
+
+
+def with_linked(stored: dict, paths: set) -> set:
+    """paths plus every stored path connected to them through shared duplicates"""
+    result = set(paths)
+    queue = list(paths)
+    while queue:
+        for linked in stored.get(queue.pop(), {}).get("linked", ()):
+            if linked not in result:
+                result.add(linked)
+                queue.append(linked)
+    return result
+
+
+def record_duplicates(collection, canonical: dict, duplicates: dict, batch_size: int = WRITE_BATCH_SIZE):
+    """Attach the locations of skipped duplicates to the chunk stored for them"""
+    ids = list(duplicates)
+    for start in range(0, len(ids), batch_size):
+        batch = ids[start:start + batch_size]
+        try:
+            collection.update(
+                ids=batch,
+                metadatas=[
+                    {**canonical[chunk_id], "duplicates": json.dumps(duplicates[chunk_id]),
+                     "duplicate_count": len(duplicates[chunk_id])}
+                    for chunk_id in batch
+                ]
+            )
+        except Exception as e:
+            logger.error(f"Duplicate update error: {str(e)}")
+
+
+def process_repo(source, session_id: str, collection, progress: IngestProgress = None,
+                 incremental: bool = False, lexical=None, checkpoints=None, resume: bool = False):
+    """Process files from a DirectorySource or ZipSource, embedding chunks in
+    batches and writing them in bulk.
+
+    Chunks that repeat an earlier chunk of the run, exactly or nearly (see
+    dedup.Deduplicator), are not embedded or stored again; their locations
+    are recorded in the stored chunk's ``duplicates`` metadata instead.
+
+    Chunk ids are derived from content and written with upsert, so chunks
+    already in the collection are never embedded again; only their
+    metadata (line numbers, file hash) is refreshed.
+
+    With ``incremental`` the session's existing chunks are diffed by file
+    hash: unchanged files are skipped, and changed or removed files (and
+    files sharing duplicates with them) are re-chunked, with their old
+    chunks deleted once the new ones are written.
+
+    When a ``lexical`` index (lexical.LexicalIndex) is given, written
+    chunks are added to it and deleted chunks removed from it as well.
+
+    With a ``checkpoints`` store (checkpoints.CheckpointStore), completed
+    files are recorded at least every CHECKPOINT_SECONDS. A ``resume`` run
+    skips those files and re-chunks every other one, reusing any of its
+    chunks that were written before the interruption.
+    """
+    progress = progress or IngestProgress()
+    pending = []
+    dedup = Deduplicator()
+    canonical = {}  # stored chunk id -> metadata
+    duplicates = {}  # stored chunk id -> locations of its duplicates
+    changed_duplicates = set()  # canonical ids whose duplicates are not recorded yet
+    completed = []  # files chunked since the last checkpoint
+    failed_paths = set()  # files with chunks that could not be embedded (write failures are in writer.failed_paths)
+
+    paths = source.list_files()
+    progress.set_total(len(paths))
+
+    parser = ParsePool(source)
+    with ChunkWriter(collection, progress=progress) as writer:
+        done = checkpoints.done_paths(session_id) if checkpoints and resume else set()
+        if resume:
+            # Partially written files can't be recognised by hash, so everything
+            # not checkpointed is rebuilt (already written chunks are reused)
+            stored = load_file_index(collection, session_id)
+            dirty = with_linked(stored, set(stored) - done)
+            done -= dirty
+        else:
+            stored = load_file_index(collection, session_id) if incremental else {}
+            dirty = find_dirty(parser, paths, stored) if stored else set()
+
+        # Old chunks of files being rebuilt; whatever isn't re-created is deleted
+        stale = {path: set(stored[path]["ids"]) for path in dirty}
+        current_paths = set(paths)
+        removed = [path for path in dirty if path not in current_paths]
+        if removed:
+            removed_ids = [chunk_id for path in removed for chunk_id in stale.pop(path)]
+            delete_chunks(collection, removed_ids)
+            if lexical:
+                lexical.delete(session_id, removed_ids)
+            progress.add(files_removed=len(removed))
+
+        def flush():
+            # Chunks already stored (same path and content) only need fresh metadata
+            existing = set(collection.get(ids=[item["id"] for item in pending], include=[])["ids"])
+            if existing:
+                kept = [item for item in pending if item["id"] in existing]
+                collection.update(
+                    ids=[item["id"] for item in kept],
+                    metadatas=[{**item["metadata"], "duplicates": "", "duplicate_count": 0} for item in kept]
+                )
+                progress.add(chunks_reused=len(kept))
+            new = [item for item in pending if item["id"] not in existing]
+
+            # Embedding batches go out concurrently, paced by the shared limiter
+            embeddings = get_embeddings([item["document"] for item in new], return_exceptions=True)
+            embedded = [(item, embed) for item, embed in zip(new, embeddings) if embed is not None]
+            failed_paths.update(item["metadata"]["path"] for item, embed in zip(new, embeddings) if embed is None)
+            progress.add(chunks_embedded=len(embedded), failures=len(new) - len(embedded))
+            if embedded:
+                writer.add(
+                    documents=[item["document"] for item, _ in embedded],
+                    embeddings=[embed for _, embed in embedded],
+                    metadatas=[item["metadata"] for item, _ in embedded],
+                    ids=[item["id"] for item, _ in embedded]
+                )
+                if lexical:
+                    lexical.add(session_id,
+                                ids=[item["id"] for item, _ in embedded],
+                                documents=[item["document"] for item, _ in embedded],
+                                metadatas=[item["metadata"] for item, _ in embedded])
+            pending.clear()
+
+        def checkpoint():
+            """Write everything chunked so far, clean up after it and record it as done"""
+            if pending:
+                flush()
+            writer.flush()
+            old = [chunk_id for path in completed for chunk_id in stale.pop(path, ())]
+            if old:
+                delete_chunks(collection, old)
+                if lexical:
+                    lexical.delete(session_id, old)
+            if changed_duplicates:
+                record_duplicates(collection, canonical, {cid: duplicates[cid] for cid in changed_duplicates})
+                changed_duplicates.clear()
+            if checkpoints:
+                # Files with failed chunks are left for a resumed run to retry
+                failed = failed_paths | writer.failed_paths
+                checkpoints.mark_done(session_id, [path for path in completed if path not in failed])
+            completed.clear()
+
+        to_parse = []
+        for rel_path in paths:
+            if rel_path in done:
+                progress.add(files_scanned=1, files_resumed=1)
+            elif rel_path in stored and rel_path not in dirty:
+                progress.add(files_scanned=1, files_unchanged=1)
+            else:
+                to_parse.append(rel_path)
+
+        # Files are read and chunked ahead on worker processes while this
+        # thread embeds and writes
+        last_checkpoint = time.monotonic()
+        for parsed in parser.parse(to_parse):
+            rel_path, file_hash, chunks = parsed["path"], parsed["hash"], parsed["chunks"]
+            if parsed["error"]:
+                progress.add(files_scanned=1, failures=1)
+                logger.error(f"File error: {parsed['error']}")
+                continue
+
+            for idx, chunk in enumerate(chunks):
+                chunk_id = make_chunk_id(session_id, rel_path, chunk["text"])
+                original = dedup.seen(chunk["text"], chunk_id, chunk["symbols"], chunk["fingerprints"])
+                if original is not None:
+                    duplicates.setdefault(original, []).append({
+                        "path": rel_path,
+                        "chunk_index": idx,
+                        "start_line": chunk["start_line"],
+                        "end_line": chunk["end_line"],
+                        "file_hash": file_hash
+                    })
+                    changed_duplicates.add(original)
+                    progress.add(chunks_deduplicated=1)
+                    continue
+
+                stale.get(rel_path, set()).discard(chunk_id)
+                canonical[chunk_id] = {
+                    "file": PurePosixPath(rel_path).name,
+                    "path": rel_path,
+                    "chunk_index": idx,
+                    "start_line": chunk["start_line"],
+                    "end_line": chunk["end_line"],
+                    "symbols": ",".join(chunk["symbols"]),
+                    "file_hash": file_hash,
+                    "session_id": session_id
+                }
+                pending.append({"document": chunk["text"], "metadata": canonical[chunk_id], "id": chunk_id})
+                if len(pending) >= EMBED_BATCH_SIZE * EMBED_WORKERS:
+                    flush()
+            completed.append(rel_path)
+            progress.add(files_scanned=1)
+
+            if checkpoints and time.monotonic() - last_checkpoint >= CHECKPOINT_SECONDS:
+                checkpoint()
+                last_checkpoint = time.monotonic()
+
+        checkpoint()
+
+    return writer.written
@@ -0,0 +1,140 @@
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from ingest import IngestProgress
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))  # Concurrent ingestion jobs
+MAX_QUEUED_JOBS = int(os.getenv("MAX_QUEUED_JOBS", "20"))  # Pending + running jobs before rejecting
+JOB_HISTORY = int(os.getenv("JOB_HISTORY", "500"))  # Finished jobs kept for /status
+JOB_STATUS_INTERVAL = float(os.getenv("JOB_STATUS_INTERVAL", "2"))  # Seconds between status publishes
+
+
+class Job:
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.status = "queued"
+        self.error = None
+        self.progress = IngestProgress()
+        self.created_at = time.time()
+        self.finished_at = None
+
+    def to_dict(self):
+        data = {
+            "session_id": self.session_id,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.progress.started_at,
+            "finished_at": self.finished_at,
+        }
+        data.update(self.progress.to_dict())
+        if self.status != "running":
+            data["eta_seconds"] = None
+        if self.error:
+            data["error"] = self.error
+        return data
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class JobManager:
+    """Runs ingestion jobs on a bounded thread pool and tracks their progress.
+
+    With a ``status_store`` (put_status/prune_status), job statuses are
+    also published there every ``status_interval`` seconds and whenever a
+    job changes state, so other worker processes can report them.
+    """
+
+    def __init__(self, max_workers: int = INGEST_WORKERS, max_queued: int = MAX_QUEUED_JOBS,
+                 history: int = JOB_HISTORY, status_store=None, status_interval: float = JOB_STATUS_INTERVAL):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest")
+        self.max_queued = max_queued
+        self.history = history
+        self.jobs = {}
+        self.lock = threading.Lock()
+        self.status_store = status_store
+        self.status_interval = status_interval
+        self.stopped = threading.Event()
+        self.publisher = None
+
+    def active_count(self) -> int:
+        return sum(1 for job in self.jobs.values() if job.status in ("queued", "running"))
+
+    def is_active(self, session_id: str) -> bool:
+        job = self.get(session_id)
+        return bool(job) and job.status in ("queued", "running")
+
+    def submit(self, session_id: str, func, *args, **kwargs) -> Job:
+        """Queue func(*args, progress=..., **kwargs) as the job for session_id"""
+        with self.lock:
+            if self.active_count() >= self.max_queued:
+                raise JobQueueFull("Too many ingestion jobs in progress")
+            job = Job(session_id)
+            self.jobs[session_id] = job
+            self._prune()
+            if self.status_store and self.publisher is None:
+                self.publisher = threading.Thread(target=self._publish_loop, name="job-status", daemon=True)
+                self.publisher.start()
+
+        self._publish(job)
+        self.executor.submit(self._run, job, func, args, kwargs)
+        return job
+
+    def get(self, session_id: str):
+        with self.lock:
+            return self.jobs.get(session_id)
+
+    def shutdown(self, wait: bool = True, cancel_futures: bool = False):
+        """Stop taking jobs; cancelled ones are left for whoever resumes them"""
+        self.stopped.set()
+        self.executor.shutdown(wait=wait, cancel_futures=cancel_futures)
+
+    def _run(self, job: Job, func, args, kwargs):
+        job.status = "running"
+        job.progress.started_at = time.time()
+        self._publish(job)
+        try:
+            func(*args, progress=job.progress, **kwargs)
+            job.status = "completed"
+        except Exception as e:
+            logger.error(f"Job {job.session_id} failed: {str(e)}")
+            job.status = "failed"
+            job.error = str(e)
+        finally:
+            job.finished_at = time.time()
+            self._publish(job)
+
+    def _publish(self, job: Job):
+        if not self.status_store:
+            return
+        try:
+            self.status_store.put_status(job.session_id, job.to_dict())
+        except Exception as e:
+            logger.error(f"Publishing status of job {job.session_id} failed: {str(e)}")
+
+    def _publish_loop(self):
+        while not self.stopped.wait(self.status_interval):
+            with self.lock:
+                active = [job for job in self.jobs.values() if job.status in ("queued", "running")]
+            for job in active:
+                self._publish(job)
+            try:
+                self.status_store.prune_status()
+            except Exception as e:
+                logger.error(f"Pruning job statuses failed: {str(e)}")
+
+    def _prune(self):
+        """Drop the oldest finished jobs beyond the history limit"""
+        finished = [job for job in self.jobs.values() if job.finished_at]
+        if len(finished) <= self.history:
+            return
+        finished.sort(key=lambda job: job.finished_at)
+        for job in finished[:len(finished) - self.history]:
+            del self.jobs[job.session_id]
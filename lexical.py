@@ -0,0 +1,153 @@
+import os
+import re
+import math
+import sqlite3
+import threading
+from collections import Counter
+
+# Configuration
+LEXICAL_DB_PATH = os.getenv("LEXICAL_DB_PATH", "lexical.sqlite3")
+BM25_K1 = 1.2
+BM25_B = 0.75
+RRF_K = 60  # Reciprocal rank fusion damping; higher flattens rank differences
+
+WORD_PATTERN = re.compile(r"[A-Za-z_$][A-Za-z0-9_$]*|\d+")
+CAMEL_PATTERN = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "for", "from", "how",
+    "i", "in", "is", "it", "of", "on", "or", "the", "this", "to", "what", "when", "where",
+    "which", "who", "why", "with",
+}
+
+
+def split_identifier(word: str) -> list:
+    """getUserName / get_user_name / HTTPServer -> their lowercased parts"""
+    parts = []
+    for piece in re.split(r"[_$]+", word):
+        parts.extend(part.lower() for part in CAMEL_PATTERN.findall(piece))
+    return parts
+
+
+def tokenize(text: str) -> list:
+    """Identifier-aware terms: each identifier plus its camelCase/snake_case parts"""
+    terms = []
+    for word in WORD_PATTERN.findall(text):
+        lowered = word.lower()
+        parts = split_identifier(word)
+        if lowered not in STOPWORDS:
+            terms.append(lowered)
+        if len(parts) > 1:
+            terms.extend(part for part in parts if len(part) > 1 and part not in STOPWORDS)
+    return terms
+
+
+def code_identifiers(text: str) -> set:
+    """Words in a question that look like code (snake_case, camelCase, or `quoted`)"""
+    identifiers = {word.lower() for word in re.findall(r"`([^`]+)`", text)}
+    for word in WORD_PATTERN.findall(text):
+        if "_" in word or re.search(r"[a-z][A-Z]", word):
+            identifiers.add(word.lower())
+    return identifiers
+
+
+def reciprocal_rank_fusion(rankings: list, k: int = RRF_K) -> list:
+    """Merge ranked id lists; ids ranked high in any list come first"""
+    scores = {}
+    for ranking in rankings:
+        for rank, chunk_id in enumerate(ranking):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores, key=lambda chunk_id: scores[chunk_id], reverse=True)
+
+
+class LexicalIndex:
+    """Per-session BM25 inverted index over chunk text, paths and symbols, in SQLite"""
+
+    def __init__(self, path: str = LEXICAL_DB_PATH):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS lexical_chunks (
+                session_id TEXT NOT NULL,
+                chunk_id TEXT NOT NULL,
+                length INTEGER NOT NULL,
+                PRIMARY KEY (session_id, chunk_id)
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS lexical_postings (
+                session_id TEXT NOT NULL,
+                term TEXT NOT NULL,
+                chunk_id TEXT NOT NULL,
+                tf INTEGER NOT NULL,
+                PRIMARY KEY (session_id, term, chunk_id)
+            )
+        """)
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS lexical_postings_chunk ON lexical_postings (session_id, chunk_id)"
+        )
+        self.conn.commit()
+
+    def add(self, session_id: str, ids: list, documents: list, metadatas: list):
+        """Index chunks (replacing any earlier entries with the same ids)"""
+        chunk_rows, posting_rows = [], []
+        for chunk_id, document, meta in zip(ids, documents, metadatas):
+            terms = Counter(tokenize(f"{meta.get('path', '')} {meta.get('symbols', '')}\n{document}"))
+            chunk_rows.append((session_id, chunk_id, sum(terms.values())))
+            posting_rows.extend((session_id, term, chunk_id, tf) for term, tf in terms.items())
+
+        with self.lock:
+            self._delete(session_id, ids)
+            self.conn.executemany(
+                "INSERT INTO lexical_chunks (session_id, chunk_id, length) VALUES (?, ?, ?)", chunk_rows
+            )
+            self.conn.executemany(
+                "INSERT INTO lexical_postings (session_id, term, chunk_id, tf) VALUES (?, ?, ?, ?)", posting_rows
+            )
+            self.conn.commit()
+
+    def delete(self, session_id: str, ids: list):
+        with self.lock:
+            self._delete(session_id, ids)
+            self.conn.commit()
+
+    def _delete(self, session_id: str, ids: list):
+        rows = [(session_id, chunk_id) for chunk_id in ids]
+        self.conn.executemany("DELETE FROM lexical_chunks WHERE session_id = ? AND chunk_id = ?", rows)
+        self.conn.executemany("DELETE FROM lexical_postings WHERE session_id = ? AND chunk_id = ?", rows)
+
+    def delete_session(self, session_id: str):
+        with self.lock:
+            self.conn.execute("DELETE FROM lexical_chunks WHERE session_id = ?", (session_id,))
+            self.conn.execute("DELETE FROM lexical_postings WHERE session_id = ?", (session_id,))
+            self.conn.commit()
+
+    def search(self, session_id: str, query: str, limit: int = 20) -> list:
+        """Top [(chunk_id, bm25 score)] for a query, best first"""
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+
+        with self.lock:
+            total, average = self.conn.execute(
+                "SELECT COUNT(*), AVG(length) FROM lexical_chunks WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            if not total:
+                return []
+
+            scores = {}
+            for term in terms:
+                postings = self.conn.execute(
+                    "SELECT p.chunk_id, p.tf, c.length FROM lexical_postings p "
+                    "JOIN lexical_chunks c ON c.session_id = p.session_id AND c.chunk_id = p.chunk_id "
+                    "WHERE p.session_id = ? AND p.term = ?",
+                    (session_id, term)
+                ).fetchall()
+                if not postings:
+                    continue
+                idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+                for chunk_id, tf, length in postings:
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * length / (average or 1))
+                    scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
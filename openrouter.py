@@ -0,0 +1,232 @@
+import os
+import json
+import time
+import asyncio
+import logging
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from throttle import parse_retry_after, backoff_delay
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+OPENROUTER_BASE_URL = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+CHAT_MODEL = "openai/gpt-3.5-turbo"
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "20"))  # Keep-alive connections per host
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "60"))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+ASYNC_HTTP_POOL_SIZE = int(os.getenv("ASYNC_HTTP_POOL_SIZE", "200"))  # Max concurrent async calls; the rest queue
+
+
+def _make_session() -> requests.Session:
+    session = requests.Session()
+    # urllib3 only retries failed connects here; status and read retries are
+    # handled in post() so 429s reach the caller's rate limiter
+    adapter = HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=HTTP_POOL_SIZE,
+        max_retries=Retry(total=HTTP_MAX_RETRIES, connect=HTTP_MAX_RETRIES, read=0,
+                          status=0, other=0, backoff_factor=0.3)
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+# Shared pooled client for every OpenRouter call
+http = _make_session()
+
+# Async client for the ASGI app, created on first use (httpx is optional)
+async_http = None
+
+
+def _headers() -> dict:
+    return {
+        "Authorization": f"Bearer {os.getenv('OPENROUTER_API_KEY')}",
+        "Content-Type": "application/json",
+        "HTTP-Referer": "http://localhost:5000",
+        "X-Title": "Code Analyzer"
+    }
+
+
+def post(path: str, payload: dict, read_timeout: float = HTTP_READ_TIMEOUT, limiter=None,
+         max_retries: int = HTTP_MAX_RETRIES, stream: bool = False,
+         retry_read_timeouts: bool = True) -> requests.Response:
+    """POST to the OpenRouter API, retrying 429s, 5xx and network errors.
+
+    When a ``limiter`` (throttle.RateLimiter) is given, every attempt waits
+    for it and reports successes and 429s back to it. Without
+    ``retry_read_timeouts`` a read timeout is raised at once, for paid calls
+    the provider may still be running.
+    """
+    for attempt in range(max_retries + 1):
+        if limiter:
+            limiter.acquire()
+        retry_after = None
+        try:
+            response = http.post(
+                f"{OPENROUTER_BASE_URL}{path}",
+                headers=_headers(),
+                json=payload,
+                timeout=(HTTP_CONNECT_TIMEOUT, read_timeout),
+                stream=stream
+            )
+            if response.status_code == 429:
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                if limiter:
+                    limiter.record_throttled(retry_after)
+                error = requests.HTTPError("429 Too Many Requests", response=response)
+            elif response.status_code >= 500:
+                error = requests.HTTPError(f"{response.status_code} Server Error", response=response)
+            else:
+                response.raise_for_status()  # Other 4xx are not worth retrying
+                if limiter:
+                    limiter.record_success()
+                return response
+            response.close()  # Return the connection to the pool before retrying
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if isinstance(e, requests.ReadTimeout) and not retry_read_timeouts:
+                raise
+            error = e
+
+        if attempt == max_retries:
+            raise error
+        delay = max(backoff_delay(attempt), retry_after or 0)
+        logger.warning(f"POST {path} failed ({str(error)}), retrying in {delay:.1f}s")
+        time.sleep(delay)
+
+
+def _async_client():
+    global async_http
+    if async_http is None:
+        import httpx
+
+        async_http = httpx.AsyncClient(
+            # Connect failures are retried by the transport, like urllib3 does for post()
+            transport=httpx.AsyncHTTPTransport(retries=HTTP_MAX_RETRIES),
+            limits=httpx.Limits(max_connections=ASYNC_HTTP_POOL_SIZE,
+                                max_keepalive_connections=ASYNC_HTTP_POOL_SIZE),
+            # No pool timeout: calls beyond the pool size wait their turn
+            timeout=httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT, pool=None)
+        )
+    return async_http
+
+
+async def close_async_client():
+    global async_http
+    if async_http is not None:
+        await async_http.aclose()
+        async_http = None
+
+
+async def async_post(path: str, payload: dict, read_timeout: float = HTTP_READ_TIMEOUT, limiter=None,
+                     max_retries: int = HTTP_MAX_RETRIES, stream: bool = False, retry_read_timeouts: bool = True):
+    """post() for coroutines, returning an httpx.Response (unread when ``stream``, aclose() it)"""
+    import httpx
+
+    client = _async_client()
+    timeout = httpx.Timeout(read_timeout, connect=HTTP_CONNECT_TIMEOUT, pool=None)
+    for attempt in range(max_retries + 1):
+        if limiter:
+            await limiter.acquire_async()
+        retry_after = None
+        try:
+            request = client.build_request("POST", f"{OPENROUTER_BASE_URL}{path}", headers=_headers(),
+                                           json=payload, timeout=timeout)
+            response = await client.send(request, stream=stream)
+            if response.status_code == 429:
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                if limiter:
+                    limiter.record_throttled(retry_after)
+                error = httpx.HTTPStatusError("429 Too Many Requests", request=request, response=response)
+            elif response.status_code >= 500:
+                error = httpx.HTTPStatusError(f"{response.status_code} Server Error", request=request,
+                                              response=response)
+            else:
+                if response.is_error:
+                    # Other 4xx are not worth retrying
+                    await response.aread()
+                    await response.aclose()
+                    response.raise_for_status()
+                if limiter:
+                    limiter.record_success()
+                return response
+            await response.aclose()
+        except httpx.TransportError as e:
+            if isinstance(e, httpx.ReadTimeout) and not retry_read_timeouts:
+                raise
+            error = e
+
+        if attempt == max_retries:
+            raise error
+        delay = max(backoff_delay(attempt), retry_after or 0)
+        logger.warning(f"POST {path} failed ({str(error)}), retrying in {delay:.1f}s")
+        await asyncio.sleep(delay)
+
+
+def _stream_deltas(line: str):
+    """Content deltas in one SSE line of a streamed completion, or None at [DONE]"""
+    # Skip blank keep-alives and ": comment" lines
+    if not line or not line.startswith("data:"):
+        return []
+    data = line[len("data:"):].strip()
+    if data == "[DONE]":
+        return None
+    chunk = json.loads(data)
+    if "error" in chunk:
+        raise RuntimeError(f"Provider error: {chunk['error']}")
+    deltas = []
+    for choice in chunk.get("choices", []):
+        delta = choice.get("delta", {}).get("content")
+        if delta:
+            deltas.append(delta)
+    return deltas
+
+
+def chat_completion(messages: list, model: str = CHAT_MODEL, **options) -> str:
+    """Run a chat completion and return the message content"""
+    # Not retried on a read timeout: the completion may still be running (and billed)
+    response = post("/chat/completions", {"model": model, "messages": messages, **options},
+                    retry_read_timeouts=False)
+    return response.json()["choices"][0]["message"]["content"]
+
+
+def stream_chat_completion(messages: list, model: str = CHAT_MODEL, **options):
+    """Run a streaming chat completion, yielding content deltas as they arrive"""
+    response = post("/chat/completions", {"model": model, "messages": messages, "stream": True, **options},
+                    stream=True, retry_read_timeouts=False)
+    # SSE is always UTF-8; requests would decode a charset-less text/event-stream as ISO-8859-1
+    response.encoding = "utf-8"
+    with response:
+        for line in response.iter_lines(decode_unicode=True):
+            deltas = _stream_deltas(line)
+            if deltas is None:
+                return
+            yield from deltas
+
+
+async def async_chat_completion(messages: list, model: str = CHAT_MODEL, **options) -> str:
+    """chat_completion() for coroutines"""
+    response = await async_post("/chat/completions", {"model": model, "messages": messages, **options},
+                                retry_read_timeouts=False)
+    return response.json()["choices"][0]["message"]["content"]
+
+
+async def async_stream_chat_completion(messages: list, model: str = CHAT_MODEL, **options):
+    """stream_chat_completion() for coroutines, as an async generator"""
+    response = await async_post("/chat/completions",
+                                {"model": model, "messages": messages, "stream": True, **options}, stream=True,
+                                retry_read_timeouts=False)
+    try:
+        async for line in response.aiter_lines():
+            deltas = _stream_deltas(line)
+            if deltas is None:
+                return
+            for delta in deltas:
+                yield delta
+    finally:
+        await response.aclose()
@@ -0,0 +1,173 @@
+import os
+import time
+import pickle
+import hashlib
+import threading
+import multiprocessing
+from collections import deque, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from chunking import chunk_file
+from dedup import fingerprint
+
+# Configuration
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", str(os.cpu_count() or 1)))  # Processes reading and chunking files, shared by all jobs
+PARSE_QUEUE_SIZE = int(os.getenv("PARSE_QUEUE_SIZE", "64"))  # Files read ahead of the embedding stage, per job
+PARSE_POOL_MIN_FILES = int(os.getenv("PARSE_POOL_MIN_FILES", "200"))  # Fewer files are handled in-process
+OPEN_SOURCES_PER_WORKER = 4  # Readers a worker keeps open, one per concurrent job
+READER_IDLE_SECONDS = 5  # Idle workers close their readers, so finished jobs' archives can be deleted
+
+_executor = None  # Pool shared by every ingestion job in this process
+_executor_lock = threading.Lock()
+_sources = OrderedDict()  # In a worker: pickled source -> open reader, least recently used first
+_sources_lock = threading.Lock()
+_busy = False  # In a worker: a file is being read
+_last_used = 0.0
+_reaper = None  # In a worker: thread closing idle readers
+
+
+def _start_method() -> str:
+    # Never fork: the server has threads (jobs, status publisher, HTTP clients)
+    # whose locks a forked child could inherit held
+    return "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+
+def shared_pool():
+    """The process's parse pool, started on first use"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            context = multiprocessing.get_context(_start_method())
+            if context.get_start_method() == "forkserver":
+                # Workers fork from a server with only this module's imports loaded
+                context.set_forkserver_preload([__name__])
+            _executor = ProcessPoolExecutor(max_workers=PARSE_WORKERS, mp_context=context)
+        return _executor
+
+
+def _discard_pool(executor):
+    """Drop a broken pool so the next job starts a fresh one"""
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _worker_source(spec: bytes):
+    """The worker's open reader for a pickled source, reused across files of a job"""
+    global _busy, _reaper
+    with _sources_lock:
+        _busy = True
+        if _reaper is None:
+            _reaper = threading.Thread(target=_close_idle_sources, name="parse-readers", daemon=True)
+            _reaper.start()
+        source = _sources.pop(spec, None)
+        if source is None:
+            source = pickle.loads(spec)
+            while len(_sources) >= OPEN_SOURCES_PER_WORKER:
+                _sources.popitem(last=False)[1].close()
+        _sources[spec] = source
+        return source
+
+
+def _worker_done():
+    global _busy, _last_used
+    with _sources_lock:
+        _busy = False
+        _last_used = time.monotonic()
+
+
+def _close_idle_sources():
+    """Close a worker's readers once it has had no files for READER_IDLE_SECONDS"""
+    while True:
+        time.sleep(1)
+        with _sources_lock:
+            if not _busy and time.monotonic() - _last_used >= READER_IDLE_SECONDS:
+                while _sources:
+                    _sources.popitem()[1].close()
+
+
+def hash_file(source, path: str):
+    """(path, sha256 of the file), or (path, None) if it can't be read"""
+    try:
+        return path, hashlib.sha256(source.read(path)).hexdigest()
+    except Exception:
+        return path, None
+
+
+def parse_file(source, path: str) -> dict:
+    """Read, hash, decode, chunk and fingerprint one file; errors are returned, not raised"""
+    try:
+        raw = source.read(path)
+        chunks = chunk_file(path, raw.decode('utf-8'))
+        for chunk in chunks:
+            chunk["fingerprints"] = fingerprint(chunk["text"])
+        return {"path": path, "hash": hashlib.sha256(raw).hexdigest(), "chunks": chunks, "error": None}
+    except Exception as e:
+        return {"path": path, "hash": None, "chunks": [], "error": str(e)}
+
+
+def _hash_in_worker(spec: bytes, path: str):
+    try:
+        return hash_file(_worker_source(spec), path)
+    finally:
+        _worker_done()
+
+
+def _parse_in_worker(spec: bytes, path: str) -> dict:
+    try:
+        return parse_file(_worker_source(spec), path)
+    finally:
+        _worker_done()
+
+
+class ParsePool:
+    """Reads and chunks a source's files on the shared process pool.
+
+    Results come back in input order as the caller consumes them, with at
+    most ``queue_size`` files read ahead, so a slow consumer (the embedding
+    stage) holds the workers back and memory stays flat however large the
+    repository is. Concurrent jobs share the PARSE_WORKERS processes. The
+    source is sent to workers pickled (by path and file identity), and each
+    worker opens its own reader, closed again once the worker goes idle.
+    Fewer than ``min_files`` files are handled in-process.
+    """
+
+    def __init__(self, source, queue_size: int = PARSE_QUEUE_SIZE, min_files: int = PARSE_POOL_MIN_FILES):
+        self.source = source
+        self.queue_size = max(1, queue_size)
+        self.min_files = min_files
+
+    def _map(self, worker, inline, paths: list):
+        if PARSE_WORKERS <= 1 or len(paths) < self.min_files:
+            for path in paths:
+                yield inline(self.source, path)
+            return
+
+        executor = shared_pool()
+        spec = pickle.dumps(self.source)
+        futures = deque()
+        try:
+            for path in paths:
+                futures.append(executor.submit(worker, spec, path))
+                if len(futures) >= self.queue_size:
+                    yield futures.popleft().result()
+            while futures:
+                yield futures.popleft().result()
+        except BrokenProcessPool:
+            _discard_pool(executor)
+            raise
+        finally:
+            # Stopped early (error or cancelled job): don't leave files queued for other jobs' workers
+            for future in futures:
+                future.cancel()
+
+    def hashes(self, paths: list):
+        """Yield (path, sha256 or None) for each path"""
+        return self._map(_hash_in_worker, hash_file, paths)
+
+    def parse(self, paths: list):
+        """Yield parse_file() results for each path"""
+        return self._map(_parse_in_worker, parse_file, paths)
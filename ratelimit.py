@@ -0,0 +1,135 @@
+import os
+import math
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+
+# Configuration
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")  # memory | sqlite (shared by all workers on a host)
+RATE_LIMIT_DB_PATH = os.getenv("RATE_LIMIT_DB_PATH", "ratelimit.sqlite3")
+RATE_LIMIT_WINDOW = 60.0  # Seconds; limits are "per minute"
+
+
+def sliding_window(state, limit: int, now: float, window: float = RATE_LIMIT_WINDOW):
+    """Count one request against a sliding-window counter.
+
+    ``state`` is (window index, count in that window, count in the window
+    before), or None for a new key. The previous window's count is weighted
+    by how much of it still overlaps the last ``window`` seconds, which
+    approximates a true sliding log in O(1) space.
+
+    Returns (new state, allowed, seconds until a request would be allowed).
+    """
+    index = int(now // window)
+    if state is None or state[0] < index - 1:
+        current, previous = 0, 0
+    elif state[0] == index - 1:
+        current, previous = 0, state[1]
+    else:
+        current, previous = state[1], state[2]
+
+    elapsed = now - index * window
+    weight = 1 - elapsed / window
+    if previous * weight + current < limit:
+        return (index, current + 1, previous), True, 0.0
+
+    # Rejected requests aren't counted, so a client that keeps retrying isn't locked out forever
+    if current >= limit or not previous:
+        retry_after = window - elapsed
+    else:
+        retry_after = window * (1 - (limit - current) / previous) - elapsed
+    return (index, current, previous), False, max(retry_after, 0.0)
+
+
+class MemoryRateLimitStore:
+    """Per-process counters; keys idle for two windows are evicted as others arrive"""
+
+    def __init__(self, window: float = RATE_LIMIT_WINDOW):
+        self.window = window
+        self.counters = OrderedDict()  # key -> (state, last seen), least recently seen first
+        self.lock = threading.Lock()
+
+    def hit(self, key: str, limit: int) -> tuple:
+        """(allowed, retry_after seconds) for one request under ``key``"""
+        now = time.time()
+        with self.lock:
+            entry = self.counters.pop(key, None)
+            state, allowed, retry_after = sliding_window(entry[0] if entry else None, limit, now, self.window)
+            self.counters[key] = (state, now)
+            # Oldest first, so this stops at the first key still in use
+            while self.counters:
+                oldest, (_, seen) = next(iter(self.counters.items()))
+                if now - seen < 2 * self.window:
+                    break
+                del self.counters[oldest]
+        return allowed, retry_after
+
+    def __len__(self):
+        return len(self.counters)
+
+
+class SQLiteRateLimitStore:
+    """Counters in a SQLite file, shared by every worker process on the host"""
+
+    def __init__(self, path: str = RATE_LIMIT_DB_PATH, window: float = RATE_LIMIT_WINDOW):
+        self.window = window
+        self.swept_window = None
+        self.lock = threading.Lock()
+        # Autocommit mode; each hit runs its own BEGIN IMMEDIATE transaction
+        self.conn = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS rate_limits (
+                key TEXT PRIMARY KEY,
+                window INTEGER NOT NULL,
+                current INTEGER NOT NULL,
+                previous INTEGER NOT NULL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS rate_limits_window ON rate_limits (window)")
+
+    def hit(self, key: str, limit: int) -> tuple:
+        """(allowed, retry_after seconds) for one request under ``key``"""
+        now = time.time()
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self.conn.execute(
+                    "SELECT window, current, previous FROM rate_limits WHERE key = ?", (key,)
+                ).fetchone()
+                state, allowed, retry_after = sliding_window(row, limit, now, self.window)
+                if allowed:
+                    self.conn.execute(
+                        "INSERT OR REPLACE INTO rate_limits (key, window, current, previous) VALUES (?, ?, ?, ?)",
+                        (key, *state)
+                    )
+                self._sweep(state[0])
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return allowed, retry_after
+
+    def _sweep(self, index: int):
+        """Drop keys idle for two windows, once per window per process"""
+        if self.swept_window != index:
+            self.conn.execute("DELETE FROM rate_limits WHERE window < ?", (index - 1,))
+            self.swept_window = index
+
+    def __len__(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM rate_limits").fetchone()[0]
+
+
+def make_rate_limit_store(name: str = RATE_LIMIT_BACKEND):
+    """Build the configured rate limit store"""
+    if name == "memory":
+        return MemoryRateLimitStore()
+    if name == "sqlite":
+        return SQLiteRateLimitStore()
+    raise ValueError(f"Unknown RATE_LIMIT_BACKEND: {name}")
+
+
+def retry_after_header(seconds: float) -> str:
+    return str(max(1, math.ceil(seconds)))
@@ -0,0 +1,81 @@
+import uuid
+import logging
+
+from chromadb.errors import ChromaError
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+LEGACY_COLLECTION = "code_chunks"  # Shared collection used before per-session collections
+COLLECTION_METADATA = {"hnsw:space": "cosine"}
+DEFAULT_EMBEDDING_MODEL = "mistralai/mistral-embed"  # Used by collections that don't record one
+
+
+def is_valid_session_id(session_id) -> bool:
+    try:
+        uuid.UUID(str(session_id))
+        return True
+    except ValueError:
+        return False
+
+
+def collection_name(session_id: str) -> str:
+    return f"session-{session_id}"
+
+
+class SessionStore:
+    """One Chroma collection per session, so queries only search that repo.
+
+    Sessions indexed before this existed live in the shared legacy
+    collection and are still readable through a session_id filter.
+    Each collection records the embedding model its vectors came from.
+    """
+
+    def __init__(self, client, embedding_model: str = DEFAULT_EMBEDDING_MODEL):
+        self.client = client
+        self.embedding_model = embedding_model
+        self.legacy = client.get_or_create_collection(
+            name=LEGACY_COLLECTION,
+            metadata=COLLECTION_METADATA
+        )
+
+    def create(self, session_id: str):
+        return self.client.get_or_create_collection(
+            name=collection_name(session_id),
+            metadata={**COLLECTION_METADATA, "embedding_model": self.embedding_model}
+        )
+
+    def drop(self, session_id: str):
+        """Delete a session's own collection"""
+        self.client.delete_collection(name=collection_name(session_id))
+
+    def is_compatible(self, collection) -> bool:
+        """Whether the collection was embedded with the current model"""
+        model = (collection.metadata or {}).get("embedding_model", DEFAULT_EMBEDDING_MODEL)
+        return model == self.embedding_model
+
+    def get(self, session_id: str):
+        """The session's own collection, or None"""
+        try:
+            return self.client.get_collection(name=collection_name(session_id))
+        except (ValueError, ChromaError):
+            return None
+
+    def is_legacy(self, session_id: str) -> bool:
+        return bool(self.legacy.get(where={"session_id": session_id}, limit=1)["ids"])
+
+    def exists(self, session_id: str) -> bool:
+        return self.get(session_id) is not None or self.is_legacy(session_id)
+
+    def resolve(self, session_id: str):
+        """(collection, where) to read a session's chunks, or (None, None)"""
+        collection = self.get(session_id)
+        if collection is not None:
+            return collection, None
+        if self.is_legacy(session_id):
+            return self.legacy, {"session_id": session_id}
+        return None, None
+
+    def drop_legacy(self, session_id: str):
+        """Remove a session's chunks from the legacy collection"""
+        self.legacy.delete(where={"session_id": session_id})
@@ -0,0 +1,84 @@
+import os
+import zipfile
+from pathlib import Path, PurePosixPath
+
+# Configuration
+ALLOWED_EXTENSIONS = {".js", ".jsx", ".ts", ".tsx", ".py", ".html", ".css", ".json"}
+MAX_SOURCE_FILE_SIZE = 1 * 1024 * 1024  # Skip files over 1MB
+
+
+def is_indexable(path: str, size: int) -> bool:
+    """Source files worth indexing: allowed extension, small, outside node_modules"""
+    parts = PurePosixPath(path).parts
+    return (
+        PurePosixPath(path).suffix.lower() in ALLOWED_EXTENSIONS
+        and 'node_modules' not in parts
+        and size <= MAX_SOURCE_FILE_SIZE
+    )
+
+
+class DirectorySource:
+    """Source files read from a directory on disk"""
+
+    def __init__(self, repo_path: str):
+        self.repo_path = repo_path
+
+    def list_files(self) -> list[str]:
+        paths = []
+        for root, dirs, files in os.walk(self.repo_path):
+            # Skip unwanted directories
+            if 'node_modules' in dirs:
+                dirs.remove('node_modules')
+
+            for filename in files:
+                filepath = Path(root) / filename
+                try:
+                    size = os.path.getsize(filepath)
+                except OSError:
+                    continue
+                rel_path = filepath.relative_to(self.repo_path).as_posix()
+                if is_indexable(rel_path, size):
+                    paths.append(rel_path)
+        return paths
+
+    def read(self, path: str) -> bytes:
+        with open(Path(self.repo_path) / path, 'rb') as f:
+            return f.read()
+
+    def close(self):
+        pass
+
+
+class ZipSource:
+    """Source files read straight from a zip archive, without extracting it.
+
+    Members are filtered using the sizes recorded in the central directory,
+    so skipped files are never decompressed.
+    """
+
+    def __init__(self, archive):
+        self.archive = archive
+        self.zip_ref = zipfile.ZipFile(archive, 'r')
+
+    def list_files(self) -> list[str]:
+        return [
+            info.filename for info in self.zip_ref.infolist()
+            if not info.is_dir() and is_indexable(info.filename, info.file_size)
+        ]
+
+    def read(self, path: str) -> bytes:
+        return self.zip_ref.read(path)
+
+    def __reduce__(self):
+        # Pickled by path; a worker process unpickling it opens its own reader. The
+        # file's identity goes along so that readers cached by workers are keyed on
+        # this archive, not on an earlier upload saved under the same path
+        try:
+            stat = os.fstat(self.zip_ref.fp.fileno())
+            version = (stat.st_dev, stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        except (AttributeError, OSError, ValueError):
+            version = None  # In-memory archive, pickled whole
+        return ZipSource, (self.archive,), {"version": version}
+
+    def close(self):
+        self.zip_ref.close()
@@ -1,10 +1,10 @@
 export async function POST(request) {
   try {
-    const { question } = await request.json();
+    const { question, session_id, stream } = await request.json();
     const response = await fetch('http://localhost:5000/ask', {
       method: 'POST',
       headers: { 'Content-Type': 'application/json' },
-      body: JSON.stringify({ question })
+      body: JSON.stringify({ question, session_id, stream })
     });
     
     if (!response.ok) {
@@ -12,6 +12,17 @@ export async function POST(request) {
       throw new Error(error || 'Failed to ask question');
     }
     
+    if (stream) {
+      // Relay the Server-Sent Events as they arrive instead of buffering
+      return new Response(response.body, {
+        headers: {
+          'Content-Type': 'text/event-stream',
+          'Cache-Control': 'no-cache',
+          'X-Accel-Buffering': 'no'
+        }
+      });
+    }
+    
     return response;
   } catch (error) {
     return new Response(JSON.stringify({ error: error.message }), {
@@ -0,0 +1,5 @@
+export async function GET(request, { params }) {
+  const { sessionId } = await params
+  const response = await fetch(`http://localhost:5000/status/${sessionId}`)
+  return response
+}
@@ -1,4 +1,5 @@
-export async function GET() {
-  const response = await fetch('http://localhost:5000/summary')
+export async function GET(request) {
+  const { searchParams } = new URL(request.url)
+  const response = await fetch(`http://localhost:5000/summary?${searchParams}`)
   return response
 }
\ No newline at end of file
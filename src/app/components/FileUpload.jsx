@@ -14,6 +14,18 @@ export default function FileUpload({ onUploadStart, onAnalysisStart, onComplete
     }
   }
 
+const waitForIngestion = async (sessionId) => {
+  // Ingestion runs in the background; poll until the job finishes
+  while (true) {
+    const statusRes = await fetch(`/api/status/${sessionId}`);
+    if (!statusRes.ok) throw new Error('Could not check upload status');
+    const status = await statusRes.json();
+    if (status.status === 'completed') return status;
+    if (status.status === 'failed') throw new Error(status.error || 'Processing failed');
+    await new Promise(resolve => setTimeout(resolve, 1000));
+  }
+};
+
 const handleUpload = async () => {
   if (!file) return;
   
@@ -24,13 +36,15 @@ const handleUpload = async () => {
   try {
     const uploadRes = await fetch('/api/upload', { method: 'POST', body: formData });
     if (!uploadRes.ok) throw new Error('Upload failed');
+    const { session_id } = await uploadRes.json();
     
     onAnalysisStart();
-    const summaryRes = await fetch('/api/summary');
+    await waitForIngestion(session_id);
+    const summaryRes = await fetch(`/api/summary?session_id=${session_id}`);
     if (!summaryRes.ok) throw new Error('Analysis failed');
     
     const summary = await summaryRes.json();
-    onComplete(summary);
+    onComplete(summary, session_id);
   } catch (error) {
     console.error('Error:', error);
     alert(`Error: ${error.message}`);
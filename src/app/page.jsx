@@ -16,9 +16,11 @@ export default function CodeAnalyzer() {
   const [analysis, setAnalysis] = useState(null)
   const [chat, setChat] = useState([])
   const [question, setQuestion] = useState('')
+  const [sessionId, setSessionId] = useState(null)
 
-  const handleAnalysisComplete = (data) => {
+  const handleAnalysisComplete = (data, session_id) => {
     setAnalysis(data)
+    setSessionId(session_id)
     setStatus('complete')
     setActiveTab('summary')
   }
@@ -33,11 +35,33 @@ export default function CodeAnalyzer() {
       const response = await fetch('/api/ask', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ question })
+        body: JSON.stringify({ question, session_id: sessionId, stream: true })
       })
+      if (!response.ok) throw new Error('Failed to ask question')
       
-      const { answer } = await response.json()
-      setChat(prev => [...prev, { type: 'ai', content: answer }])
+      // Render the answer as Server-Sent Events arrive
+      setChat(prev => [...prev, { type: 'ai', content: '' }])
+      const appendToAnswer = (text) => setChat(prev => [
+        ...prev.slice(0, -1),
+        { ...prev[prev.length - 1], content: prev[prev.length - 1].content + text }
+      ])
+      const reader = response.body.getReader()
+      const decoder = new TextDecoder()
+      let buffer = ''
+      while (true) {
+        const { done, value } = await reader.read()
+        if (done) break
+        buffer += decoder.decode(value, { stream: true })
+        const events = buffer.split('\n\n')
+        buffer = events.pop()
+        for (const event of events) {
+          const dataLine = event.split('\n').find(line => line.startsWith('data: '))
+          if (!dataLine) continue
+          const payload = JSON.parse(dataLine.slice(6))
+          if (payload.error) throw new Error(payload.error)
+          if (payload.delta) appendToAnswer(payload.delta)
+        }
+      }
     } catch (error) {
       setChat(prev => [...prev, { 
         type: 'ai', 
@@ -0,0 +1,255 @@
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from pathlib import PurePosixPath
+from concurrent.futures import ThreadPoolExecutor
+
+from openrouter import chat_completion
+from dedup import duplicate_locations
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+SUMMARY_DB_PATH = os.getenv("SUMMARY_DB_PATH", "summaries.sqlite3")
+SUMMARY_WORKERS = int(os.getenv("SUMMARY_WORKERS", "4"))  # Concurrent LLM calls while summarizing
+FILE_SUMMARY_CHARS = 6000  # Source text sent per file
+REDUCE_SUMMARY_CHARS = 8000  # Child summaries combined per reduce call
+ROOT = "."
+
+
+def generate_summary(collection, where: dict = None):
+    """Ask the LLM for a JSON summary of a few chunks, or None if there are none"""
+    results = collection.get(where=where, limit=20)
+    if not results['documents']:
+        return None
+
+    context = "\n".join(results['documents'][:5])  # Use first 5 chunks
+    return chat_completion(
+        [{
+            "role": "user",
+            "content": f"Summarize this code:\n{context}\nRespond in JSON with: projectName, technologies, codeQuality, architecture"
+        }],
+        response_format={"type": "json_object"}
+    )
+
+
+def node_key(*parts) -> str:
+    return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+
+
+def load_files(collection, where: dict = None, page_size: int = 5000) -> dict:
+    """Reassemble stored chunks into {path: (content hash, text)}"""
+    chunks = {}
+    offset = 0
+    while True:
+        results = collection.get(
+            where=where,
+            include=["documents", "metadatas"],
+            limit=page_size,
+            offset=offset
+        )
+        for document, meta in zip(results["documents"], results["metadatas"]):
+            chunks.setdefault(meta["path"], []).append((meta.get("chunk_index", 0), document))
+            # Deduplicated chunks are stored once but belong to every file they appear in
+            for location in duplicate_locations(meta):
+                chunks.setdefault(location["path"], []).append((location["chunk_index"], document))
+        if len(results["ids"]) < page_size:
+            break
+        offset += page_size
+
+    files = {}
+    for path, parts in chunks.items():
+        text = "\n".join(document for _, document in sorted(parts))
+        files[path] = (hashlib.sha256(text.encode("utf-8")).hexdigest(), text)
+    return files
+
+
+class HierarchicalSummarizer:
+    """Map-reduce summary of a repository: files, then directories, then the repo.
+
+    Every node is cached under a key derived from its inputs (file content
+    for files, child keys for directories), so after a re-index only
+    changed files and their ancestor directories are summarized again.
+    """
+
+    def __init__(self, cache=None, workers: int = SUMMARY_WORKERS):
+        self.cache = cache
+        self.workers = workers
+        self.llm_calls = 0
+        self.lock = threading.Lock()
+
+    def _chat(self, prompt: str, **options) -> str:
+        with self.lock:
+            self.llm_calls += 1
+        return chat_completion([{"role": "user", "content": prompt}], **options)
+
+    def _cached(self, key: str, compute) -> str:
+        if self.cache:
+            summary = self.cache.get_node(key)
+            if summary is not None:
+                return summary
+        summary = compute()
+        if self.cache:
+            self.cache.put_node(key, summary)
+        return summary
+
+    def summarize_file(self, path: str, content_hash: str, text: str):
+        key = node_key("file", path, content_hash)
+        return key, self._cached(key, lambda: self._chat(
+            f"Summarize the file {path} in 2-3 sentences: its purpose, main "
+            f"functions/classes and notable dependencies.\n\n{text[:FILE_SUMMARY_CHARS]}",
+            temperature=0.2
+        ))
+
+    def combine(self, label: str, children: list) -> str:
+        """Reduce child (name, summary) pairs to one summary, in rounds if they don't fit"""
+        lines = [f"- {name}: {summary}" for name, summary in children]
+        while sum(len(line) for line in lines) > REDUCE_SUMMARY_CHARS and len(lines) > 1:
+            groups, current, size = [], [], 0
+            for line in lines:
+                if current and size + len(line) > REDUCE_SUMMARY_CHARS:
+                    groups.append(current)
+                    current, size = [], 0
+                current.append(line)
+                size += len(line)
+            groups.append(current)
+            lines = [f"- part {i + 1}: {self._reduce(label, group)}" for i, group in enumerate(groups)]
+        return self._reduce(label, lines)
+
+    def _reduce(self, label: str, lines: list) -> str:
+        listing = "\n".join(lines)[:REDUCE_SUMMARY_CHARS]
+        return self._chat(
+            f"Summarize {label} in 3-4 sentences from these summaries of its contents:\n{listing}",
+            temperature=0.2
+        )
+
+    def summarize_dir(self, path: str, children: list):
+        """children: [(name, key, summary)] for the directory's direct entries"""
+        if len(children) == 1:
+            # Nothing to combine; reuse the only child's summary
+            _, key, summary = children[0]
+            return key, summary
+        children = sorted(children)
+        key = node_key("dir", path, *(f"{name}={child_key}" for name, child_key, _ in children))
+        label = "the repository root" if path == ROOT else f"the directory {path}"
+        return key, self._cached(key, lambda: self.combine(label, [(name, s) for name, _, s in children]))
+
+    def summarize_repo(self, root_key: str, root_summary: str, paths: list) -> str:
+        listing = "\n".join(sorted(paths)[:200])
+        return self._cached(node_key("repo", root_key), lambda: self._chat(
+            f"Summarize this codebase.\nOverview:\n{root_summary}\n\nFiles:\n{listing}\n"
+            f"Respond in JSON with: projectName, technologies, codeQuality, architecture",
+            response_format={"type": "json_object"}
+        ))
+
+    def summarize(self, collection, where: dict = None):
+        """JSON summary of everything in the collection, or None if it is empty"""
+        files = load_files(collection, where)
+        if not files:
+            return None
+
+        children = {}  # directory -> direct entries (files and subdirectories)
+        for path in files:
+            current = PurePosixPath(path)
+            for parent in current.parents:
+                children.setdefault(parent.as_posix(), set()).add(current.as_posix())
+                current = parent
+
+        levels = {}
+        for directory in children:
+            depth = len(PurePosixPath(directory).parts)  # "." has no parts
+            levels.setdefault(depth, []).append(directory)
+
+        nodes = {}  # path -> (key, summary)
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            # Map: every file in parallel
+            futures = {
+                path: executor.submit(self.summarize_file, path, content_hash, text)
+                for path, (content_hash, text) in files.items()
+            }
+            for path, future in futures.items():
+                nodes[path] = future.result()
+
+            # Reduce: one directory level at a time, deepest first
+            for depth in sorted(levels, reverse=True):
+                futures = {
+                    directory: executor.submit(self.summarize_dir, directory, [
+                        (PurePosixPath(child).name, *nodes[child]) for child in children[directory]
+                    ])
+                    for directory in levels[depth]
+                }
+                for directory, future in futures.items():
+                    nodes[directory] = future.result()
+
+        root_key, root_summary = nodes[ROOT]
+        return self.summarize_repo(root_key, root_summary, list(files))
+
+
+class SummaryStore:
+    """Repository summaries per session, plus the summarizer's node cache, in SQLite"""
+
+    def __init__(self, path: str = SUMMARY_DB_PATH):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS summaries (
+                session_id TEXT PRIMARY KEY,
+                summary TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS summary_nodes (
+                key TEXT PRIMARY KEY,
+                summary TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+        self.conn.commit()
+
+    def get(self, session_id: str):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT summary FROM summaries WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def put(self, session_id: str, summary: str):
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO summaries (session_id, summary, created_at) VALUES (?, ?, ?)",
+                (session_id, summary, time.time())
+            )
+            self.conn.commit()
+
+    def delete(self, session_id: str):
+        with self.lock:
+            self.conn.execute("DELETE FROM summaries WHERE session_id = ?", (session_id,))
+            self.conn.commit()
+
+    def get_node(self, key: str):
+        with self.lock:
+            row = self.conn.execute("SELECT summary FROM summary_nodes WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def put_node(self, key: str, summary: str):
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO summary_nodes (key, summary, created_at) VALUES (?, ?, ?)",
+                (key, summary, time.time())
+            )
+            self.conn.commit()
+
+    def refresh(self, session_id: str, collection, where: dict = None):
+        """Regenerate and store a session's summary"""
+        summarizer = HierarchicalSummarizer(cache=self)
+        summary = summarizer.summarize(collection, where)
+        logger.info(f"Summarized {session_id} with {summarizer.llm_calls} LLM calls")
+        if summary is None:
+            self.delete(session_id)
+        else:
+            self.put(session_id, summary)
+        return summary
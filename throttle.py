@@ -0,0 +1,98 @@
+import time
+import random
+import asyncio
+import threading
+from email.utils import parsedate_to_datetime
+
+
+class RateLimiter:
+    """Token bucket for outbound provider calls.
+
+    The refill rate adapts to the provider: it grows slowly while calls
+    succeed and is halved whenever a call is throttled (HTTP 429), with
+    all callers paused for the Retry-After period. Concurrent 429s from the
+    same burst only count as one decrease.
+    """
+
+    def __init__(self, rate: float, max_rate: float = None, min_rate: float = 0.2,
+                 burst: int = None, increase: float = 0.25, decrease_interval: float = 1.0):
+        self.rate = rate
+        self.max_rate = max_rate or rate
+        self.min_rate = min_rate
+        self.burst = burst or max(1, int(rate))
+        self.increase = increase
+        self.decrease_interval = decrease_interval
+        self.decreased_at = 0.0
+        self.tokens = float(self.burst)
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+        self.throttled = 0
+        self.lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def _take(self) -> float:
+        """Take a token and return 0, or return how long to wait before trying again"""
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            wait = self.blocked_until - now
+            if wait <= 0:
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return 0.0
+                wait = (1 - self.tokens) / self.rate
+            return wait
+
+    def acquire(self):
+        """Block until a call is allowed"""
+        while True:
+            wait = self._take()
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        """acquire() for coroutines: waits without blocking the event loop"""
+        while True:
+            wait = self._take()
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    def record_success(self):
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def record_throttled(self, retry_after: float = None):
+        """Back off after a 429: halve the rate and pause everyone"""
+        with self.lock:
+            now = time.monotonic()
+            self.throttled += 1
+            if now - self.decreased_at >= self.decrease_interval:
+                self.rate = max(self.min_rate, self.rate / 2)
+                self.decreased_at = now
+            self.tokens = 0.0
+            if retry_after:
+                self.blocked_until = max(self.blocked_until, now + retry_after)
+
+
+def parse_retry_after(value) -> float:
+    """Retry-After header in seconds (accepts delta-seconds or an HTTP date)"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 30.0) -> float:
+    """Exponential backoff with full jitter"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))